@@ -0,0 +1,245 @@
+import time
+
+import numpy as np
+from cat_mouse_cheese_env import BatchCatMouseCheeseEnv
+from training_metrics import TrainingMetrics
+
+# Deep Q-network su CPU, solo NumPy: al posto della Q-table (g^6 righe) una piccola MLP
+# (ReLU, Adam, perdita di Huber, in float32) stima Q(stato, .) da caratteristiche dello stato:
+#   "positions": coordinate normalizzate di topo, gatto e formaggio e vettori topo->formaggio, topo->gatto
+#   "walls":     mosse del topo non bloccate da muri o ostacoli (4 valori)
+#   "maze":      per ogni mossa del topo, distanza nel labirinto (env.distances) dalla cella di
+#                arrivo al formaggio e al gatto (8 valori)
+# La dimensione del modello non dipende dalla griglia, quindi funziona anche dove la Q-table
+# non entra in memoria. L'esperienza arriva da BatchCatMouseCheeseEnv (num_envs episodi per
+# tick, azioni scelte in lotto) e finisce in un buffer circolare preallocato che memorizza gli
+# indici piatti degli stati (le caratteristiche si ricalcolano al campionamento). Il target
+# usa una rete bersaglio copiata ogni target_update aggiornamenti (double DQN: l'azione la
+# sceglie la rete online, il valore lo da' quella bersaglio).
+
+FEATURES = ("positions", "walls", "maze")
+
+class StateFeatures:
+    # Indici piatti degli stati (vedi CatMouseCheeseEnv._compile_state_index) -> matrice (n, dim) float32
+    def __init__(self, env, features=("positions", "walls", "maze")):
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Caratteristiche sconosciute {sorted(unknown)}: scegliere tra {', '.join(FEATURES)}")
+        self.features = tuple(features)
+        self.grid_size = env.grid_size
+        self.num_cells = env.grid_size * env.grid_size
+        self.weights = (env._mouse_weight, env._cat_weight, env._cheese_weight)
+        cells = np.arange(self.num_cells)
+        scale = max(env.grid_size - 1, 1)
+        self.rows = (cells // env.grid_size / scale).astype(np.float32)
+        self.cols = (cells % env.grid_size / scale).astype(np.float32)
+        self.next_cell = env.next_cell
+        self.open_moves = (env.next_cell != cells[:, None]).astype(np.float32)
+        # Distanze normalizzate; le coppie non raggiungibili valgono 1
+        unreachable = np.iinfo(env.distances.dtype).max
+        longest = max(int(env.distances[env.distances != unreachable].max()), 1)
+        self.distances = np.minimum(env.distances / longest, 1).astype(np.float32)
+        self.dim = 10 * ("positions" in features) + 4 * ("walls" in features) + 8 * ("maze" in features)
+
+    def cells(self, states):
+        states = np.asarray(states, dtype=np.int64)
+        return [states // weight % self.num_cells for weight in self.weights]
+
+    def __call__(self, states):
+        mouse, cat, cheese = self.cells(states)
+        columns = []
+        if "positions" in self.features:
+            rows = [self.rows[cell] for cell in (mouse, cat, cheese)]
+            cols = [self.cols[cell] for cell in (mouse, cat, cheese)]
+            columns += [rows[0], cols[0], rows[1], cols[1], rows[2], cols[2],
+                        rows[2] - rows[0], cols[2] - cols[0], rows[1] - rows[0], cols[1] - cols[0]]
+        if "walls" in self.features:
+            columns += list(self.open_moves[mouse].T)
+        if "maze" in self.features:
+            targets = self.next_cell[mouse]
+            columns += list(self.distances[targets, cheese[:, None]].T) + list(self.distances[targets, cat[:, None]].T)
+        return np.stack(columns, axis=1)
+
+class QNetwork:
+    # MLP dim -> hidden... -> 4 con inizializzazione di He e ottimizzatore Adam
+    def __init__(self, input_dim, hidden=(128, 128), learning_rate=1e-3, seed=None):
+        rng = np.random.default_rng(seed)
+        sizes = (input_dim, *hidden, 4)
+        self.learning_rate = learning_rate
+        self.params = []
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+            self.params.append((rng.standard_normal((fan_in, fan_out)) * np.sqrt(2 / fan_in)).astype(np.float32))
+            self.params.append(np.zeros(fan_out, dtype=np.float32))
+        self._moments = [np.zeros_like(param) for param in self.params]
+        self._squares = [np.zeros_like(param) for param in self.params]
+        self.updates = 0
+
+    @property
+    def nbytes(self):
+        return sum(param.nbytes for param in self.params)
+
+    def predict(self, x):
+        for k in range(0, len(self.params) - 2, 2):
+            x = np.maximum(x @ self.params[k] + self.params[k + 1], 0)
+        return x @ self.params[-2] + self.params[-1]
+
+    def train_step(self, x, actions, targets, huber=1.0):
+        # Un passo di Adam sulla perdita di Huber tra Q(x, actions) e targets; ritorna la perdita media
+        activations = [x]
+        for k in range(0, len(self.params) - 2, 2):
+            activations.append(np.maximum(activations[-1] @ self.params[k] + self.params[k + 1], 0))
+        q = activations[-1] @ self.params[-2] + self.params[-1]
+        lanes = np.arange(len(x))
+        error = q[lanes, actions] - targets
+        grad_q = np.zeros_like(q)
+        grad_q[lanes, actions] = np.clip(error, -huber, huber) / len(x)
+
+        grads = [None] * len(self.params)
+        grad = grad_q
+        for k in range(len(self.params) - 2, -1, -2):
+            grads[k] = activations[k // 2].T @ grad
+            grads[k + 1] = grad.sum(axis=0)
+            if k:
+                grad = (grad @ self.params[k].T) * (activations[k // 2] > 0)
+
+        self.updates += 1
+        beta1, beta2 = 0.9, 0.999
+        step = self.learning_rate * np.sqrt(1 - beta2 ** self.updates) / (1 - beta1 ** self.updates)
+        for param, grad, moment, square in zip(self.params, grads, self._moments, self._squares):
+            moment *= beta1
+            moment += (1 - beta1) * grad
+            square *= beta2
+            square += (1 - beta2) * grad * grad
+            param -= step * moment / (np.sqrt(square) + 1e-8)
+        absolute = np.abs(error)
+        return float(np.mean(np.where(absolute < huber, 0.5 * error * error, huber * (absolute - 0.5 * huber))))
+
+    def copy_from(self, other):
+        for param, source in zip(self.params, other.params):
+            param[...] = source
+
+class ReplayBuffer:
+    # Buffer circolare preallocato di transizioni (stato, azione, ricompensa, stato successivo, fine)
+    def __init__(self, capacity, seed=None):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.states, self.actions, self.rewards, self.next_states, self.dones))
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        count = len(states)
+        index = (self.position + np.arange(count)) % self.capacity
+        self.states[index] = states
+        self.actions[index] = actions
+        self.rewards[index] = rewards
+        self.next_states[index] = next_states
+        self.dones[index] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        index = self.rng.integers(self.size, size=batch_size)
+        return self.states[index], self.actions[index], self.rewards[index], self.next_states[index], self.dones[index]
+
+class DQNAgent:
+    # Rete online, rete bersaglio e codifica degli stati. Chiamare l'agente su un array di indici
+    # piatti restituisce le azioni greedy (vedi evaluate_policy)
+    def __init__(self, env, features=("positions", "walls", "maze"), hidden=(128, 128), learning_rate=1e-3, seed=None):
+        self.encode = StateFeatures(env, features)
+        self.online = QNetwork(self.encode.dim, hidden, learning_rate, seed)
+        self.target = QNetwork(self.encode.dim, hidden, learning_rate)
+        self.target.copy_from(self.online)
+        self.hidden = tuple(hidden)
+
+    def q_values(self, states):
+        return self.online.predict(self.encode(states))
+
+    def __call__(self, states):
+        return np.argmax(self.q_values(states), axis=1)
+
+    def save(self, filename):
+        # np.savez aggiungerebbe comunque .npz al nome: lo si aggiunge qui e si ritorna il percorso scritto
+        if not filename.endswith(".npz"):
+            filename += ".npz"
+        np.savez(filename, features=np.array(self.encode.features), hidden=np.array(self.hidden),
+                 **{f"param{k}": param for k, param in enumerate(self.online.params)})
+        return filename
+
+    @classmethod
+    def load(cls, env, filename):
+        with np.load(filename) as data:
+            agent = cls(env, tuple(data["features"].tolist()), tuple(data["hidden"].tolist()))
+            for k, param in enumerate(agent.online.params):
+                param[...] = data[f"param{k}"]
+        agent.target.copy_from(agent.online)
+        return agent
+
+def train_dqn(env, episodes=100000, gamma=0.95, epsilon=1.0, epsilon_decay=0.9999, min_epsilon=0.05, num_envs=256,
+              features=("positions", "walls", "maze"), hidden=(128, 128), learning_rate=1e-3, batch_size=256,
+              buffer_size=1000000, learning_starts=10000, updates_per_tick=4, target_update=1000, reward_scale=0.1,
+              max_steps=500, seed=None, metrics=None, agent=None):
+    # Come train_q_learning_batch, con la rete al posto della Q-table: epsilon decade per
+    # episodio concluso, le ricompense vengono moltiplicate per reward_scale (solo per
+    # l'apprendimento, le metriche usano quelle originali) e gli episodi piu' lunghi di
+    # max_steps passi vengono troncati (senza azzerare il valore dello stato successivo).
+    # Con agent l'addestramento riparte da un DQNAgent esistente
+    sequence = np.random.SeedSequence(seed)
+    env_seed, buffer_seed, network_seed, agent_seed = sequence.spawn(4)
+    batch_env = BatchCatMouseCheeseEnv(num_envs, grid_size=env.grid_size, seed=env_seed, max_steps=max_steps,
+                                       observation="index", distance=env.distance)
+    rng = np.random.default_rng(agent_seed)
+    if agent is None:
+        agent = DQNAgent(env, features, hidden, learning_rate, network_seed)
+    buffer = ReplayBuffer(buffer_size, buffer_seed)
+    if metrics is None:
+        metrics = TrainingMetrics()
+    lanes = np.arange(batch_size)
+    total_reward = np.zeros(num_envs)
+    completed = 0
+    start = time.perf_counter()
+
+    state, _ = batch_env.reset()
+    while completed < episodes:
+        current_epsilon = max(min_epsilon, epsilon * epsilon_decay ** completed)
+        action = np.argmax(agent.q_values(state), axis=1)
+        explore = rng.random(num_envs) < current_epsilon
+        action[explore] = rng.integers(4, size=np.count_nonzero(explore))
+
+        obs, reward, done, truncated, info = batch_env.step(action)
+        buffer.add_batch(state, action, reward * reward_scale, info["final_obs"], done)
+
+        if len(buffer) >= learning_starts:
+            for _ in range(updates_per_tick):
+                states, actions, rewards, next_states, dones = buffer.sample(batch_size)
+                next_features = agent.encode(next_states)
+                best = np.argmax(agent.online.predict(next_features), axis=1)
+                next_value = agent.target.predict(next_features)[lanes, best]
+                targets = rewards + gamma * np.where(dones, 0, next_value)
+                agent.online.train_step(agent.encode(states), actions.astype(np.int64), targets.astype(np.float32))
+                if agent.online.updates % target_update == 0:
+                    agent.target.copy_from(agent.online)
+
+        total_reward += reward
+        finished = done | truncated
+        if finished.any():
+            ended = np.flatnonzero(finished)[:episodes - completed]
+            metrics.record_batch(total_reward[ended], info["episode_steps"][ended], info["found"][ended], current_epsilon)
+            completed += len(ended)
+            total_reward[finished] = 0
+        state = obs
+
+    print(f"🧠 DQN: {completed} episodi, {agent.online.updates} aggiornamenti in {time.perf_counter() - start:.1f}s "
+          f"(modello {agent.online.nbytes / 2 ** 10:.0f} KB, buffer {buffer.nbytes / 2 ** 20:.0f} MB)")
+    return agent, metrics
@@ -0,0 +1,211 @@
+import heapq
+
+import numpy as np
+from cat_mouse_cheese_env import UniformStream, spawn_generators
+from training_metrics import TrainingMetrics
+
+# Q-learning con modello (Dyna-Q e prioritized sweeping): ogni transizione reale aggiorna la
+# Q-table come in train_q_learning e viene registrata in un modello; tra un passo reale e
+# l'altro si eseguono planning_steps backup simulati sul modello (con lo stesso alpha).
+# Il modello e' fattorizzato come l'ambiente: la mossa del topo e' nota (next_cell[topo, azione])
+# e la risposta del gatto dipende solo dalla sua cella, quindi dalle transizioni reali si stima
+# per ogni cella del gatto la distribuzione empirica delle sue (al massimo 4) mosse. Le
+# ricompense seguono le regole della variante (env.transition_rewards); la penalita' di rivisita
+# dipende dalla storia dell'episodio e si usa la frequenza osservata con cui la cella d'arrivo
+# del topo era gia' stata visitata. Il backup simulato di una coppia (stato, azione) e' il valore
+# atteso sulle risposte del gatto e vale per qualsiasi stato la cui cella del gatto sia stata
+# osservata, anche se lo stato non e' mai stato visitato: un modello indicizzato per coppia
+# (stato, azione) ripeterebbe solo le transizioni gia' viste.
+#   prioritized=False: Dyna-Q, backup su stati estratti uniformemente (in un lotto vettoriale)
+#   prioritized=True:  prioritized sweeping, backup in ordine di errore di Bellman (coda con
+#                      priorita'), propagato ai predecessori dello stato aggiornato. La coda ha al
+#                      piu' una voce valida per coppia (la priorita' corrente sta in model.priority,
+#                      le voci superate si scartano all'estrazione) ed e' limitata a max_queue voci
+
+class DynaModel:
+    def __init__(self, env, seed=None, max_queue=1 << 16):
+        num_cells = env.grid_size * env.grid_size
+        self.env = env
+        self.num_cells = num_cells
+        self.mouse_weight, self.cat_weight, self.cheese_weight = env._mouse_weight, env._cat_weight, env._cheese_weight
+        self.next_cell = env.next_cell
+        self.cat_moves = env.cat_moves
+        self.cat_targets = env._cat_targets
+        self.free_cells = env.free_cells
+        self.rng = np.random.default_rng(seed)
+        # cat_counts[cella, k]: mosse k del gatto osservate da quella cella; entries e revisits:
+        # ingressi del topo in una cella (senza restare fermo) e quanti erano rivisite
+        self.cat_counts = np.zeros((num_cells, 4), dtype=np.uint32)
+        self.entries = np.zeros(num_cells, dtype=np.uint32)
+        self.revisits = np.zeros(num_cells, dtype=np.uint32)
+        # Predecessori per il prioritized sweeping, in tabelle (celle, massimo) completate con -1:
+        # coppie (cella, azione) del topo che portano in ogni cella (come cella * 4 + azione) e
+        # celle del gatto da cui ogni cella e' raggiungibile
+        mouse_sources = [[cell * 4 + action for cell in self.free_cells.tolist() for action in range(4)
+                          if self.next_cell[cell, action] == target] for target in range(num_cells)]
+        cat_sources = [[cell for cell in self.free_cells.tolist() if target in self.cat_targets[cell]]
+                       for target in range(num_cells)]
+        self.mouse_predecessors, self.cat_predecessors = (
+            np.array([row + [-1] * (max(map(len, rows)) - len(row)) for row in rows], dtype=np.int64)
+            for rows in (mouse_sources, cat_sources))
+        self.priority = np.zeros(env.grid_size ** 6 * 4, dtype=np.float64)
+        self.queue = []
+        self.max_queue = max_queue
+        self.real_updates = 0
+        self.planned_updates = 0
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.cat_counts, self.entries, self.revisits, self.priority))
+
+    def _decode(self, states):
+        return (states // self.mouse_weight % self.num_cells, states // self.cat_weight % self.num_cells,
+                states // self.cheese_weight % self.num_cells)
+
+    def record(self, state, action, reward, next_state, done):
+        # Registra una transizione reale: la mossa del gatto e, se il topo e' entrato in un'altra
+        # cella senza terminare l'episodio, se era una rivisita (ricompensa diversa da quella senza penalita')
+        mouse, cat, cheese = self._decode(state)
+        new_mouse, new_cat, _ = self._decode(next_state)
+        self.cat_counts[cat, self.cat_targets[cat].index(new_cat)] += 1
+        if not done and new_mouse != mouse:
+            fresh, _ = self.env.transition_rewards(mouse, cat, new_mouse, new_cat, cheese, False)
+            self.entries[new_mouse] += 1
+            self.revisits[new_mouse] += abs(reward - fresh) > 1e-9
+
+    def expected_targets(self, states, actions, flat_q, gamma):
+        # sum_k p_k * (r_k + gamma * max_a Q(s'_k, a)) sulle mosse k del gatto, con p_k empiriche
+        # e r_k media tra rivisita e prima visita pesata con la frequenza di rivisita osservata
+        mouse, cat, cheese = (part[..., None] for part in self._decode(np.asarray(states)))
+        new_mouse = self.next_cell[mouse, np.asarray(actions)[..., None]]
+        new_cat = self.cat_moves[cat[..., 0]]
+        counts = self.cat_counts[cat[..., 0]].astype(np.float64)
+        revisit = np.where(new_mouse == mouse, 1.0, self.revisits[new_mouse] / np.maximum(self.entries[new_mouse], 1))
+        seen_reward, done = self.env.transition_rewards(mouse, cat, new_mouse, new_cat, cheese, True)
+        fresh_reward, _ = self.env.transition_rewards(mouse, cat, new_mouse, new_cat, cheese, False)
+        reward = revisit * seen_reward + (1 - revisit) * fresh_reward
+        next_states = new_mouse * self.mouse_weight + new_cat * self.cat_weight + cheese * self.cheese_weight
+        values = counts * (reward + gamma * np.where(done, 0, flat_q[next_states].max(axis=-1)))
+        return values.sum(axis=-1) / counts.sum(axis=-1)
+
+    def plan(self, flat_q, steps, alpha, gamma):
+        # Dyna-Q: `steps` backup attesi su stati estratti uniformemente tra quelli con la cella del
+        # gatto gia' osservata (topo separato da gatto e formaggio) e azioni uniformi
+        observed = np.flatnonzero(self.cat_counts.any(axis=1))
+        mouse = self.free_cells[self.rng.integers(len(self.free_cells), size=steps)]
+        cheese = self.free_cells[self.rng.integers(len(self.free_cells), size=steps)]
+        cat = observed[self.rng.integers(len(observed), size=steps)]
+        valid = (mouse != cat) & (mouse != cheese)
+        states = (mouse * self.mouse_weight + cat * self.cat_weight + cheese * self.cheese_weight)[valid]
+        actions = self.rng.integers(4, size=len(states))
+        flat_q[states, actions] += alpha * (self.expected_targets(states, actions, flat_q, gamma) - flat_q[states, actions])
+        self.planned_updates += len(states)
+
+    def push(self, pair, error, theta):
+        # Accoda la coppia (stato * 4 + azione) solo se l'errore supera theta e la sua priorita' corrente
+        if error <= theta or error <= self.priority[pair]:
+            return
+        self.priority[pair] = error
+        heapq.heappush(self.queue, (-error, pair))
+        if len(self.queue) > self.max_queue:
+            self._rebuild_queue()
+
+    def _rebuild_queue(self):
+        # Ricostruisce la coda con le sole voci valide, al piu' max_queue // 2 (le piu' prioritarie)
+        pairs = np.flatnonzero(self.priority)
+        limit = self.max_queue // 2
+        if len(pairs) > limit:
+            order = np.argpartition(-self.priority[pairs], limit)
+            self.priority[pairs[order[limit:]]] = 0
+            pairs = pairs[order[:limit]]
+        self.queue = list(zip((-self.priority[pairs]).tolist(), pairs.tolist()))
+        heapq.heapify(self.queue)
+
+    def predecessors(self, states):
+        # Coppie (stato, azione), con la cella del gatto osservata, da cui si puo' arrivare negli stati dati
+        mouse, cat, cheese = self._decode(states)
+        sources = self.mouse_predecessors[mouse][:, :, None]
+        cat_sources = self.cat_predecessors[cat][:, None, :]
+        source_mouse = sources // 4
+        valid = ((sources >= 0) & (cat_sources >= 0) & self.cat_counts[cat_sources].any(axis=-1)
+                 & (source_mouse != cat_sources) & (source_mouse != cheese[:, None, None]))
+        sources, cat_sources = np.broadcast_to(sources, valid.shape)[valid], np.broadcast_to(cat_sources, valid.shape)[valid]
+        cheese = np.broadcast_to(cheese[:, None, None], valid.shape)[valid]
+        states = sources // 4 * self.mouse_weight + cat_sources * self.cat_weight + cheese * self.cheese_weight
+        return states, sources % 4
+
+    def sweep(self, flat_q, steps, alpha, gamma, theta):
+        # Prioritized sweeping: estrae dalla coda fino a `steps` coppie valide (priorita' = -errore
+        # di Bellman) e le aggiorna insieme, poi i predecessori degli stati aggiornati entrano in
+        # coda se il loro errore supera theta
+        pairs = []
+        while self.queue and len(pairs) < steps:
+            priority, pair = heapq.heappop(self.queue)
+            if -priority == self.priority[pair]:
+                self.priority[pair] = 0
+                pairs.append(pair)
+        if not pairs:
+            return
+        states, actions = np.divmod(np.array(pairs), 4)
+        flat_q[states, actions] += alpha * (self.expected_targets(states, actions, flat_q, gamma) - flat_q[states, actions])
+        self.planned_updates += len(pairs)
+        states, actions = self.predecessors(np.unique(states))
+        if len(states):
+            pairs = states * 4 + actions
+            errors = np.abs(self.expected_targets(states, actions, flat_q, gamma) - flat_q[states, actions])
+            urgent = (errors > theta) & (errors > self.priority[pairs])
+            for pair, error in zip(pairs[urgent].tolist(), errors[urgent].tolist()):
+                self.push(pair, error, theta)
+
+def train_dyna_q(env, episodes=100000, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_decay=0.995, min_epsilon=0.05,
+                 planning_steps=10, prioritized=False, theta=1e-3, metrics=None, model=None, seed=None):
+    # Come train_q_learning, con planning_steps backup simulati dopo ogni passo reale.
+    # I contatori model.real_updates e model.planned_updates (e metrics.total_steps, i passi
+    # reali dell'ambiente) misurano il lavoro fatto; passare model per leggerli o per proseguire
+    q_table = np.zeros((env.grid_size,) * 6 + (4,))
+    flat_q = q_table.reshape(-1, 4)
+    if metrics is None:
+        metrics = TrainingMetrics()
+    env_generator, agent_generator, model_generator = spawn_generators(seed, 3)
+    if seed is not None:
+        env.set_generator(env_generator)
+    if model is None:
+        model = DynaModel(env, seed=model_generator)
+    uniform = UniformStream(agent_generator)
+
+    for episode in range(episodes):
+        env.reset()
+        state = env.state_index
+        done = False
+        total_reward = 0
+        steps = 0
+
+        while not done:
+            if uniform() < epsilon:
+                action = int(uniform() * 4)
+            else:
+                action = int(np.argmax(flat_q[state]))
+
+            _, reward, done, _, _ = env.step(action)
+            next_state = env.state_index
+
+            flat_q[state, action] = (1 - alpha) * flat_q[state, action] + alpha * (reward + gamma * (0 if done else np.max(flat_q[next_state])))
+            model.real_updates += 1
+            model.record(state, action, reward, next_state, done)
+            if prioritized:
+                model.push(state * 4 + action, abs(model.expected_targets(state, action, flat_q, gamma) - flat_q[state, action]), theta)
+                model.sweep(flat_q, planning_steps, alpha, gamma, theta)
+            elif planning_steps:
+                model.plan(flat_q, planning_steps, alpha, gamma)
+
+            state = next_state
+            total_reward += reward
+            steps += 1
+
+        metrics.record(total_reward, steps, env.mouse_pos == env.cheese_pos, epsilon)
+        epsilon = max(min_epsilon, epsilon * epsilon_decay)
+
+    print(f"🔁 {'Prioritized sweeping' if prioritized else 'Dyna-Q'}: {model.real_updates} aggiornamenti reali, "
+          f"{model.planned_updates} simulati, {np.count_nonzero(model.cat_counts.any(axis=1))} celle del gatto "
+          f"osservate ({model.nbytes / 2 ** 20:.0f} MB)")
+    return q_table, metrics
@@ -0,0 +1,77 @@
+import math
+import time
+
+import numpy as np
+from cat_mouse_cheese_env import BatchCatMouseCheeseEnv
+from sparse_q_table import SparseQTable
+
+# Valutazione vettoriale di una politica greedy: la Q-table viene ridotta una volta a
+# policy[stato] (int8 sull'indice piatto dello stato) e migliaia di episodi vengono giocati
+# insieme su BatchCatMouseCheeseEnv, con troncamento dopo max_steps passi.
+# Con una SparseQTable la politica non viene materializzata (avrebbe g^6 voci): le azioni greedy
+# si calcolano a ogni passo dalle sole righe degli stati correnti.
+
+def greedy_policy(q_table):
+    # Come np.argmax(q_table[stato]) per ogni stato (a parita' vince l'azione piu' bassa)
+    flat_q = np.asarray(q_table).reshape(-1, 4)
+    policy = np.zeros(len(flat_q), dtype=np.int8)
+    best = flat_q[:, 0]
+    for action in range(1, 4):
+        policy[flat_q[:, action] > best] = action
+        best = np.maximum(best, flat_q[:, action])
+    return policy
+
+def wilson_interval(successes, total, z=1.96):
+    if total == 0:
+        return 0.0, 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    centre = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return centre - margin, centre + margin
+
+def evaluate_policy(env, q_table, episodes=10000, max_steps=500, num_envs=16384, seed=None):
+    # q_table puo' essere la Q-table (densa o SparseQTable), una politica gia' calcolata con greedy_policy
+    # o una funzione da indici piatti degli stati ad azioni (per esempio un DQNAgent, vedi dqn.py)
+    start = time.perf_counter()
+    sparse = isinstance(q_table, SparseQTable)
+    function = callable(q_table)
+    if not sparse and not function:
+        policy = q_table if np.ndim(q_table) == 1 else greedy_policy(q_table)
+    num_envs = min(num_envs, episodes)
+    batch_env = BatchCatMouseCheeseEnv(num_envs, grid_size=env.grid_size, seed=seed, max_steps=max_steps, observation="index")
+
+    # Ogni corsia gioca un numero fisso di episodi: fermarsi ai primi `episodes` episodi
+    # conclusi sovrarappresenterebbe quelli brevi
+    quota = np.full(num_envs, episodes // num_envs)
+    quota[:episodes % num_envs] += 1
+    found = caught = timeout = 0
+    length_sum = length_sq_sum = 0.0
+
+    state, _ = batch_env.reset()
+    while quota.any():
+        state, _, done, truncated, info = batch_env.step(q_table(state) if function else greedy_policy(q_table.get(state)) if sparse else policy[state])
+        finished = (done | truncated) & (quota > 0)
+        if finished.any():
+            found += np.count_nonzero(info["found"] & finished)
+            caught += np.count_nonzero(info["caught"] & finished)
+            timeout += np.count_nonzero(truncated & finished)
+            lengths = info["episode_steps"][finished].astype(np.float64)
+            length_sum += lengths.sum()
+            length_sq_sum += (lengths * lengths).sum()
+            quota -= finished
+
+    mean_length = length_sum / episodes
+    length_margin = 1.96 * math.sqrt(max(length_sq_sum / episodes - mean_length ** 2, 0.0) / episodes)
+    return {
+        "episodes": episodes,
+        "success_rate": found / episodes,
+        "success_ci": wilson_interval(found, episodes),
+        "caught_rate": caught / episodes,
+        "caught_ci": wilson_interval(caught, episodes),
+        "timeout_rate": timeout / episodes,
+        "timeout_ci": wilson_interval(timeout, episodes),
+        "mean_length": mean_length,
+        "mean_length_ci": (mean_length - length_margin, mean_length + length_margin),
+        "seconds": time.perf_counter() - start,
+    }
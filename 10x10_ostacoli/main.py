@@ -1,60 +1,313 @@
-import pygame
+import os
 import numpy as np
 import time
-import random
-import pickle
-import matplotlib.pyplot as plt
-from cat_mouse_cheese_env import CatMouseCheeseEnv
-from graphics import init_graphics, draw_grid, render_entities, load_images
+from cat_mouse_cheese_env import CatMouseCheeseEnv, BatchCatMouseCheeseEnv, UniformStream, spawn_generators
+from parallel_training import train_q_learning_parallel
+from value_iteration import value_iteration, policy_iteration
+import qtable_io
+from evaluation import evaluate_policy
+from training_metrics import TrainingMetrics, load_metrics
+from sparse_q_table import SparseQTable
+from checkpoint import CheckpointWriter, load_checkpoint, capture_rng_state, restore_rng_state
+from profiler import TrainingProfiler, RESET, ACTION, STEP, UPDATE, BOOKKEEPING
+from dqn import train_dqn, DQNAgent
+from dyna import train_dyna_q, DynaModel
+from eligibility_traces import SparseTraces, BatchTraces, TRACE_KINDS
+from convergence import ConvergenceMonitor
 
-def train_q_learning(env, episodes=1000000, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_decay=0.995, min_epsilon=0.05):
+def train_q_learning(env, episodes=1000000, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_decay=0.995, min_epsilon=0.05, metrics=None,
+                     checkpoint_path=None, checkpoint_every=10000, seed=None, profiler=None, trace_lambda=0.0, trace_kind="watkins",
+                     convergence=None):
+    # Con convergence (un ConvergenceMonitor) ogni convergence.check_every episodi si misurano la
+    # variazione della Q-table e il successo della politica greedy, e l'addestramento si ferma
+    # prima di `episodes` se hanno smesso di migliorare (vedi convergence.py).
+    # Con trace_lambda > 0 si usa Q(lambda) con tracce sparse (trace_kind "watkins" o "peng", vedi
+    # eligibility_traces.py): le ricompense terminali risalgono l'episodio in un solo passaggio.
+    # Con checkpoint_path, ogni checkpoint_every episodi salva un checkpoint da cui resume_q_learning riparte.
+    # Con profiler (un TrainingProfiler) il ciclo misura il tempo di ogni fase, vedi profiler.py.
+    # Con seed l'ambiente e la scelta epsilon-greedy usano due stream indipendenti derivati da seed
+    # (senza, l'ambiente mantiene il suo generatore): lo stesso seed riproduce la stessa Q-table
     q_table = np.zeros((env.grid_size, env.grid_size, env.grid_size, env.grid_size, env.grid_size, env.grid_size, 4))
-    rewards_per_episode = []
+    if metrics is None:
+        metrics = TrainingMetrics()
+    if trace_kind not in TRACE_KINDS:
+        raise ValueError(f"Tracce sconosciute {trace_kind!r}: scegliere tra {', '.join(TRACE_KINDS)}")
+    params = {"episodes": episodes, "alpha": alpha, "gamma": gamma, "epsilon_decay": epsilon_decay,
+              "min_epsilon": min_epsilon, "checkpoint_every": checkpoint_every, "trace_lambda": trace_lambda,
+              "trace_kind": trace_kind}
+    env_generator, agent_generator = spawn_generators(seed, 2)
+    if seed is not None:
+        env.set_generator(env_generator)
+    return _run_q_learning(env, q_table, metrics, 0, epsilon, params, checkpoint_path, UniformStream(agent_generator), profiler,
+                           convergence)
 
-    for episode in range(episodes):
-        state, _ = env.reset()
-        done = False
-        total_reward = 0
+def resume_q_learning(env, checkpoint_path, profiler=None, convergence=None):
+    # Riprende train_q_learning dall'ultimo checkpoint (Q-table, epsilon, episodio, stato dei
+    # generatori casuali e metriche): il risultato e' identico a quello di un'esecuzione senza interruzioni
+    q_table, state = load_checkpoint(checkpoint_path)
+    uniform = restore_rng_state(env, state["rng"])
+    metrics = TrainingMetrics.from_state(state["metrics"])
+    print(f"♻️ Ripresa da {checkpoint_path}: episodio {state['episode']}/{state['params']['episodes']}")
+    # Lo stato del monitor di convergenza si ripristina in quello passato (o in uno nuovo con i
+    # parametri salvati); i checkpoint senza monitor o precedenti all'arresto anticipato non lo hanno
+    saved = state.get("convergence")
+    if saved is not None:
+        if convergence is None:
+            convergence = ConvergenceMonitor.from_state(saved)
+        else:
+            convergence.load_state_dict(saved)
+        # Il checkpoint si salva prima del controllo dello stesso episodio: se era dovuto si esegue
+        # ora, sulla stessa Q-table (il controllo non usa i generatori dell'addestramento)
+        if convergence.due(state["episode"]) and convergence.check(state["episode"], env, q_table):
+            print(f"🛑 Arresto anticipato all'episodio {convergence.stopped_at}: {convergence.reason}")
+            return q_table, metrics
+    return _run_q_learning(env, q_table, metrics, state["episode"], state["epsilon"], state["params"], checkpoint_path, uniform, profiler,
+                           convergence)
 
-        while not done:
-            if random.uniform(0, 1) < epsilon:
-                action = env.action_space.sample()
-            else:
-                action = np.argmax(q_table[state[0], state[1], state[2], state[3], state[4], state[5]])
+def _run_q_learning(env, q_table, metrics, first_episode, epsilon, params, checkpoint_path, uniform, profiler=None, convergence=None):
+    episodes, alpha, gamma = params["episodes"], params["alpha"], params["gamma"]
+    epsilon_decay, min_epsilon, checkpoint_every = params["epsilon_decay"], params["min_epsilon"], params["checkpoint_every"]
+    # I checkpoint salvati prima di Q(lambda) non hanno questi parametri
+    trace_lambda, trace_kind = params.get("trace_lambda", 0.0), params.get("trace_kind", "watkins")
+    # I checkpoint si salvano a fine episodio, con le tracce vuote: non serve salvarle
+    traces = SparseTraces() if trace_lambda > 0 else None
+    flat_values = q_table.reshape(-1)
+    cut_traces = traces is not None and trace_kind == "watkins"
+    peng = traces is not None and trace_kind == "peng"
+    writer = CheckpointWriter(checkpoint_path) if checkpoint_path is not None else None
+    flat_q = q_table.reshape(-1, 4)
+    profiling = profiler is not None
+    if profiling:
+        profiler.start()
+
+    try:
+        for episode in range(first_episode, episodes):
+            if profiling:
+                profiler.begin_episode(episode)
+            # Indice piatto dello stato mantenuto dall'ambiente (vedi CatMouseCheeseEnv._compile_state_index)
+            env.reset()
+            state = env.state_index
+            if traces is not None:
+                traces.clear()
+            if profiling:
+                profiler.lap(RESET)
+            done = False
+            total_reward = 0
+            steps = 0
+
+            while not done:
+                if uniform() < epsilon:
+                    action = int(uniform() * 4)
+                    # Watkins: un'azione esplorativa non greedy interrompe le tracce
+                    if cut_traces and flat_q[state, action] < np.max(flat_q[state]):
+                        traces.clear()
+                else:
+                    action = np.argmax(flat_q[state])
+                if profiling:
+                    profiler.lap(ACTION)
+
+                _, reward, done, _, _ = env.step(action)
+                next_state = env.state_index
+                if profiling:
+                    profiler.lap(STEP)
+
+                if traces is None:
+                    flat_q[state, action] = (1 - alpha) * flat_q[state, action] + alpha * (reward + gamma * np.max(flat_q[next_state]))
+                elif peng:
+                    target = reward + gamma * np.max(flat_q[next_state])
+                    traces.update_peng(flat_values, state * 4 + action, alpha * (target - flat_q[state, action]),
+                                       alpha * (target - np.max(flat_q[state])), gamma * trace_lambda)
+                else:
+                    td_error = reward + gamma * np.max(flat_q[next_state]) - flat_q[state, action]
+                    traces.visit(state * 4 + action)
+                    traces.update(flat_values, alpha * td_error, gamma * trace_lambda)
 
-            next_state, reward, done, _, _ = env.step(action)
+                state = next_state
+                total_reward += reward
+                steps += 1
+                if profiling:
+                    profiler.lap(UPDATE)
 
-            q_table[state[0], state[1], state[2], state[3], state[4], state[5], action] = (1 - alpha) * q_table[state[0], state[1], state[2], state[3], state[4], state[5], action] + \
-                alpha * (reward + gamma * np.max(q_table[next_state[0], next_state[1], next_state[2], next_state[3], next_state[4], next_state[5]]))
+            metrics.record(total_reward, steps, env.mouse_pos == env.cheese_pos, epsilon)
+            epsilon = max(min_epsilon, epsilon * epsilon_decay)
 
-            state = next_state
-            total_reward += reward
+            if writer is not None and (episode + 1) % checkpoint_every == 0:
+                writer.save(q_table, {"episode": episode + 1, "epsilon": epsilon, "params": params,
+                                      "rng": capture_rng_state(env, uniform), "metrics": metrics.state_dict(),
+                                      "convergence": None if convergence is None else convergence.state_dict()})
+            if profiling:
+                profiler.lap(BOOKKEEPING)
+                profiler.end_episode(episode, steps)
+            if convergence is not None and convergence.due(episode + 1) and convergence.check(episode + 1, env, q_table):
+                print(f"🛑 Arresto anticipato all'episodio {convergence.stopped_at}: {convergence.reason}")
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+        if profiling:
+            profiler.stop()
 
-        epsilon = max(min_epsilon, epsilon * epsilon_decay)
-        rewards_per_episode.append(total_reward)
+    return q_table, metrics
 
-    return q_table, rewards_per_episode
+def _greedy_actions(q_rows):
+    # np.argmax(q_rows, axis=1) colonna per colonna (a parità vince l'azione più bassa):
+    # sulle righe corte da 4 valori è molto più veloce della riduzione generica
+    best = q_rows[:, 0]
+    action = np.zeros(len(q_rows), dtype=np.int64)
+    for a in range(1, 4):
+        action[q_rows[:, a] > best] = a
+        best = np.maximum(best, q_rows[:, a])
+    return action
 
-def plot_learning_curve(rewards_per_episode, filename="learning_curve.png"):
-    plt.plot(rewards_per_episode)
+def _max_q(q_rows):
+    return np.maximum(np.maximum(q_rows[:, 0], q_rows[:, 1]), np.maximum(q_rows[:, 2], q_rows[:, 3]))
+
+def train_q_learning_batch(env, episodes=1000000, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_decay=0.995, min_epsilon=0.05, num_envs=1024, seed=None, metrics=None,
+                           sparse=False, max_rows=None, symmetry=False, q_table=None, trace_lambda=0.0, trace_kind="watkins",
+                           trace_length=64, convergence=None):
+    # Come train_q_learning, ma con num_envs episodi avanzati insieme a ogni tick.
+    # Tutti gli aggiornamenti di un tick leggono la Q-table di inizio tick; se più episodi
+    # aggiornano la stessa coppia (stato, azione) si applica la media dei loro errori TD.
+    # Con sparse=True la Q-table e' una SparseQTable (solo gli stati visitati, al massimo max_rows righe).
+    # Con symmetry=True si memorizzano e aggiornano solo gli stati canonici rispetto alle simmetrie
+    # della griglia (env.symmetries); alla fine la tabella viene espansa a tutti gli stati.
+    # Con q_table l'addestramento riparte da una Q-table esistente: una tabella densa viene copiata,
+    # una SparseQTable (con sparse=True) aggiornata sul posto; per proseguire la schedule di epsilon
+    # passare come epsilon il valore raggiunto.
+    # Con trace_lambda > 0 si usa Q(lambda) come in train_q_learning, con le ultime trace_length
+    # coppie di ogni episodio (BatchTraces); le tracce di un episodio concluso vengono azzerate.
+    # Con convergence l'addestramento si ferma in anticipo come in train_q_learning.
+    if trace_kind not in TRACE_KINDS:
+        raise ValueError(f"Tracce sconosciute {trace_kind!r}: scegliere tra {', '.join(TRACE_KINDS)}")
+    batch_env = BatchCatMouseCheeseEnv(num_envs, grid_size=env.grid_size, seed=seed, observation="index",
+                                       distance=env.distance)
+    rng = batch_env.rng
+    shape = (env.grid_size,) * 6
+    if sparse and symmetry:
+        raise ValueError("symmetry=True richiede la Q-table densa")
+    if sparse:
+        q_table = SparseQTable(env.grid_size, max_rows=max_rows) if q_table is None else q_table
+    elif symmetry:
+        # Per ogni stato: riga compatta del suo rappresentante canonico e simmetria che ve lo porta
+        canonical, transform = env.canonical_states(np.arange(env.grid_size ** 6))
+        canonical_keys, canonical_row = np.unique(canonical, return_inverse=True)
+        if q_table is None:
+            flat_q = np.zeros((len(canonical_keys), 4))
+        else:
+            flat_q = np.asarray(q_table, dtype=np.float64).reshape(-1, 4)[canonical_keys]
+        print(f"🔷 {len(env.symmetries)} simmetrie: {env.grid_size ** 6} stati, {len(canonical_keys)} canonici")
+    else:
+        q_table = np.zeros(shape + (4,)) if q_table is None else np.array(q_table, dtype=np.float64)
+        flat_q = q_table.reshape(-1, 4)
+    lanes = np.arange(num_envs)
+    if metrics is None:
+        metrics = TrainingMetrics()
+    total_reward = np.zeros(num_envs)
+    completed = 0
+    traces = BatchTraces(num_envs, trace_length) if trace_lambda > 0 else None
+
+    state, _ = batch_env.reset()
+    while completed < episodes:
+        current_epsilon = max(min_epsilon, epsilon * epsilon_decay ** completed)
+        if symmetry:
+            row, actions = canonical_row.take(state), env.symmetry_actions[transform.take(state)]
+            q_state = flat_q.take(row, axis=0)[lanes[:, None], actions]
+        else:
+            row = state
+            q_state = q_table.get(state) if sparse else flat_q.take(state, axis=0)
+        action = _greedy_actions(q_state)
+        explore = rng.random(num_envs) < current_epsilon
+        action[explore] = rng.integers(4, size=np.count_nonzero(explore))
+        if traces is not None and trace_kind == "watkins":
+            traces.clear(q_state[lanes, action] < _max_q(q_state))
+
+        obs, reward, done, _, info = batch_env.step(action)
+        next_state = info["final_obs"]
+
+        next_row = canonical_row.take(next_state) if symmetry else next_state
+        q_next = q_table.get(next_row) if sparse else flat_q.take(next_row, axis=0)
+        target = reward + gamma * _max_q(q_next)
+        td_error = target - q_state[lanes, action]
+        if symmetry:
+            action = actions[lanes, action]
+        index = row * 4 + action
+        if traces is not None and trace_kind == "peng":
+            # Peng: le coppie dei passi precedenti ricevono r + gamma * max Q(s') - max Q(s), quella
+            # corrente td_error; sulle coppie ripetute la media, come sopra
+            trace_lane, earlier, trace = traces.active()
+            traces.visit(index)
+            index = np.concatenate([earlier, index])
+            td_error = np.concatenate([(target - _max_q(q_state))[trace_lane] * trace, td_error])
+        elif traces is not None:
+            # Watkins: ogni episodio aggiorna tutte le coppie che traccia; sulle coppie ripetute la media, come sopra
+            traces.visit(index)
+            trace_lane, index, trace = traces.active()
+            td_error = td_error[trace_lane] * trace
+        _, inverse, counts = np.unique(index, return_inverse=True, return_counts=True)
+        if sparse:
+            q_table.add(index // 4, index % 4, alpha * td_error / counts[inverse])
+        else:
+            np.add.at(flat_q.reshape(-1), index, alpha * td_error / counts[inverse])
+        if traces is not None:
+            traces.decay(gamma * trace_lambda)
+            traces.clear(done)
+
+        total_reward += reward
+        if done.any():
+            finished = np.flatnonzero(done)[:episodes - completed]
+            metrics.record_batch(total_reward[finished], info["episode_steps"][finished], info["found"][finished], current_epsilon)
+            completed += len(finished)
+            total_reward[done] = 0
+            if convergence is not None and convergence.due(completed):
+                current = flat_q[canonical_row[:, None], env.symmetry_actions[transform]] if symmetry else q_table
+                if convergence.check(completed, env, current):
+                    print(f"🛑 Arresto anticipato all'episodio {convergence.stopped_at}: {convergence.reason}")
+                    break
+        state = np.where(done, obs, next_state)
+
+    if symmetry:
+        # Q(s, a) = Q(canonico, permutazione[a]) per ogni stato
+        q_table = flat_q[canonical_row[:, None], env.symmetry_actions[transform]].reshape(shape + (4,))
+    return q_table, metrics
+
+def plot_learning_curve(rewards_per_episode, filename="learning_curve.png", show=True):
+    # rewards_per_episode: ricompense per episodio, oppure un TrainingMetrics o il suo file CSV
+    # (anche mentre l'addestramento e' in corso), di cui si disegnano le medie sottocampionate
+    # matplotlib si importa solo qui; con show=False si usa il backend Agg, senza finestra
+    import matplotlib
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    if isinstance(rewards_per_episode, (TrainingMetrics, str)):
+        records = load_metrics(rewards_per_episode)
+        plt.plot(records["episode"], records["mean_reward"])
+    else:
+        plt.plot(rewards_per_episode)
     plt.xlabel('Episode')
     plt.ylabel('Total Reward')
     plt.title('Learning Curve')
     plt.savefig(filename)
-    plt.show()
+    if show:
+        plt.show()
+    plt.close()
 
-def save_q_table(q_table, filename="q_table.pkl"):
-    with open(filename, "wb") as file:
-        pickle.dump(q_table, file)
+def save_q_table(q_table, filename="q_table.qtab", dtype=np.float32, sparse=False):
+    # .qtab: formato binario di qtable_io (float32/float16, denso o solo righe visitate); .pkl: pickle.
+    # q_table puo' essere anche una SparseQTable (salvata sempre con le sole righe memorizzate)
+    qtable_io.save_q_table(q_table, filename, variant=CatMouseCheeseEnv.variant, state_order=CatMouseCheeseEnv.state_order,
+                           dtype=dtype, sparse=sparse)
 
-def load_q_table(filename="q_table.pkl"):
-    with open(filename, "rb") as file:
-        return pickle.load(file)
+def load_q_table(filename="q_table.qtab", mmap_mode="r", sparse=False):
+    # Le tabelle .qtab dense vengono mappate in memoria; i vecchi .pkl vengono ancora letti con pickle.
+    # sparse=True restituisce una SparseQTable
+    return qtable_io.load_q_table(filename, mmap_mode=mmap_mode, variant=CatMouseCheeseEnv.variant, sparse=sparse)
 
 def test_q_learning(env, q_table, episodes=10, delay=0.5):
-    pygame.init()
-    screen, clock = init_graphics(env.grid_size)
-    mouse_img, cat_img, cheese_img = load_images()
+    import pygame
+    from graphics import Renderer
+
+    renderer = Renderer(env.grid_size, env.walls)
 
     for i in range(episodes):
         state, _ = env.reset()
@@ -71,10 +324,8 @@ def test_q_learning(env, q_table, episodes=10, delay=0.5):
             action = np.argmax(q_table[state[0], state[1], state[2], state[3], state[4], state[5]])
             state, _, done, _, _ = env.step(action)
 
-            draw_grid(screen, env.grid_size)
-            render_entities(screen, env.mouse_pos, env.cat_pos, env.cheese_pos, env.walls, env.grid_size, mouse_img, cat_img, cheese_img)
-            pygame.display.flip()
-            clock.tick(30)
+            renderer.draw(env.mouse_pos, env.cat_pos, env.cheese_pos)
+            renderer.clock.tick(30)
             time.sleep(delay)
 
         if state[0:2].tolist() == env.cheese_pos:
@@ -83,34 +334,52 @@ def test_q_learning(env, q_table, episodes=10, delay=0.5):
             print("💀 Il topo è stato preso dal gatto! 😿")
         time.sleep(1)
 
-    pygame.quit()
+    renderer.close()
 
-def calculate_accuracy(env, q_table, test_episodes):
-    successes = 0
+def record_rollouts(env, q_table, episodes=1, directory="frames", max_steps=500):
+    # Gioca episodi greedy senza finestra (driver SDL dummy) e salva un PNG per ogni frame
+    from graphics import Renderer
 
-    for _ in range(test_episodes):
+    os.makedirs(directory, exist_ok=True)
+    renderer = Renderer(env.grid_size, env.walls, headless=True)
+    for i in range(episodes):
         state, _ = env.reset()
-        done = False
-
-        while not done:
+        renderer.draw(env.mouse_pos, env.cat_pos, env.cheese_pos)
+        renderer.save_frame(os.path.join(directory, f"episode{i:03d}_step0000.png"))
+        for step in range(1, max_steps + 1):
             action = np.argmax(q_table[state[0], state[1], state[2], state[3], state[4], state[5]])
             state, _, done, _, _ = env.step(action)
+            renderer.draw(env.mouse_pos, env.cat_pos, env.cheese_pos)
+            renderer.save_frame(os.path.join(directory, f"episode{i:03d}_step{step:04d}.png"))
+            if done:
+                break
+    renderer.close()
 
-        if state[0:2].tolist() == env.cheese_pos:
-            successes += 1
-        elif state[0:2].tolist() == env.cat_pos:
-            pass
-
-    accuracy = (successes / test_episodes) * 100
-    print(f"✅ Accuratezza: {accuracy:.2f}% su {test_episodes} episodi di test")
+def calculate_accuracy(env, q_table, test_episodes, max_steps=500):
+    # Episodi giocati in parallelo con la politica greedy precalcolata (vedi evaluation.py);
+    # gli episodi che superano max_steps passi vengono troncati invece di girare all'infinito
+    results = evaluate_policy(env, q_table, episodes=test_episodes, max_steps=max_steps)
+    accuracy = results["success_rate"] * 100
+    low, high = results["success_ci"]
+    print(f"✅ Accuratezza: {accuracy:.2f}% (IC 95% {low * 100:.2f}-{high * 100:.2f}%) su {test_episodes} episodi di test")
+    print(f"   😿 Catturato: {results['caught_rate'] * 100:.2f}% | ⏱️ Troncati dopo {max_steps} passi: "
+          f"{results['timeout_rate'] * 100:.2f}% | 👣 Lunghezza media: {results['mean_length']:.2f} passi")
     return accuracy
-    
+
 def main():
+    # Le stesse operazioni senza modificare questo file: python cli.py --variant 10x10_ostacoli {train,eval,play,plot,bench}
     env = CatMouseCheeseEnv(grid_size=10)
     # Addestramento e salvataggio della Q-table
-    #q_table, rewards_per_episode = train_q_learning(env)
-    #save_q_table(q_table, "q_table.pkl")
-    #plot_learning_curve(rewards_per_episode, filename="learning_curve.png")
+    #q_table, metrics = train_q_learning(env, metrics=TrainingMetrics(filename="metrics.csv"), checkpoint_path="training.ckpt")
+    #q_table, metrics = resume_q_learning(env, "training.ckpt")
+    #q_table, metrics = train_q_learning_batch(env, num_envs=1024, metrics=TrainingMetrics(filename="metrics.csv"))
+    #q_table, metrics = train_q_learning_parallel(env, num_workers=32, mode="hogwild")
+    #q_table = value_iteration(env)
+    #agent, metrics = train_dqn(env, episodes=100000); agent.save("dqn.npz")
+    #q_table, metrics = train_dyna_q(env, episodes=20000, planning_steps=10, prioritized=False)
+    #q_table, metrics = train_q_learning(env, convergence=ConvergenceMonitor(check_every=10000))
+    #save_q_table(q_table, "q_table.qtab")
+    #plot_learning_curve("metrics.csv", filename="learning_curve.png")
     
     # Caricamento della Q-table e test
     q_table = load_q_table("q_table1000000.pkl")
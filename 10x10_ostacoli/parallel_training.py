@@ -0,0 +1,160 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from cat_mouse_cheese_env import CatMouseCheeseEnv, UniformStream, spawn_generators
+from training_metrics import TrainingMetrics
+
+# Addestramento Q-learning su più processi: ogni worker ha il suo CatMouseCheeseEnv e
+# aggiorna una Q-table che vive in multiprocessing.shared_memory.
+#   mode="hogwild": i worker scrivono direttamente sulla tabella condivisa, senza lock
+#   mode="merge":   ogni worker lavora su una copia locale e ogni merge_every episodi
+#                   somma alla tabella condivisa le proprie variazioni (sotto lock)
+# I worker inviano gli esiti degli episodi a blocchi di metrics.log_every, che il processo
+# principale registra in metrics (record_batch) man mano che arrivano.
+# Se un worker termina senza consegnare i risultati (eccezione, OOM killer) gli altri vengono
+# fermati e train_q_learning_parallel solleva RuntimeError.
+
+def _train_worker(worker_id, shm_name, grid_size, distance, episodes, alpha, gamma, epsilon, epsilon_decay, min_epsilon,
+                  mode, merge_every, lock, results, seed, report_every):
+    # seed e' il SeedSequence figlio di questo worker: stream indipendenti per ambiente ed esplorazione
+    env_generator, agent_generator = spawn_generators(seed, 2)
+    uniform = UniformStream(agent_generator)
+    shape = (grid_size,) * 6 + (4,)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    shared_q = np.ndarray(shape, dtype=np.float64, buffer=shm.buf).reshape(-1, 4)
+    env = CatMouseCheeseEnv(grid_size=grid_size, observation="index", distance=distance)
+    env.set_generator(env_generator)
+
+    if mode == "hogwild":
+        q_table = shared_q
+    else:
+        snapshot = shared_q.copy()
+        q_table = snapshot.copy()
+
+    # Esiti degli episodi non ancora inviati al processo principale
+    rewards = np.zeros(report_every, dtype=np.float32)
+    lengths = np.zeros(report_every, dtype=np.float32)
+    successes = np.zeros(report_every, dtype=np.float32)
+    filled = 0
+    steps = 0
+    start = time.perf_counter()
+    for episode in range(episodes):
+        state, _ = env.reset()
+        done = False
+        total_reward = 0
+        length = 0
+
+        while not done:
+            q_row = q_table[state]
+            if uniform() < epsilon:
+                action = int(uniform() * 4)
+            else:
+                action = np.argmax(q_row)
+
+            next_state, reward, done, _, _ = env.step(action)
+
+            q_row[action] = (1 - alpha) * q_row[action] + alpha * (reward + gamma * np.max(q_table[next_state]))
+
+            state = next_state
+            total_reward += reward
+            length += 1
+
+        steps += length
+        rewards[filled], lengths[filled], successes[filled] = total_reward, length, env.mouse_pos == env.cheese_pos
+        filled += 1
+        if filled == report_every or episode + 1 == episodes:
+            # Copie: la coda serializza i messaggi in un thread separato
+            results.put(("episodes", worker_id, rewards[:filled].copy(), lengths[:filled].copy(), successes[:filled].copy(),
+                         epsilon))
+            filled = 0
+        epsilon = max(min_epsilon, epsilon * epsilon_decay)
+
+        if mode == "merge" and ((episode + 1) % merge_every == 0 or episode + 1 == episodes):
+            with lock:
+                shared_q += q_table - snapshot
+                snapshot[:] = shared_q
+            q_table[:] = snapshot
+
+    elapsed = time.perf_counter() - start
+    del q_table, shared_q
+    shm.close()
+    results.put(("done", worker_id, episodes, steps, elapsed))
+
+def _next_result(results, workers, finished, poll=1.0):
+    # Attende il prossimo risultato controllando ogni `poll` secondi che i worker ancora attesi
+    # siano vivi; un worker uscito con codice diverso da 0 ferma tutti gli altri
+    while True:
+        try:
+            return results.get(timeout=poll)
+        except queue.Empty:
+            pass
+        failed = [(worker_id, process.exitcode) for worker_id, process in enumerate(workers)
+                  if finished[worker_id] is None and process.exitcode not in (None, 0)]
+        if failed:
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+            for process in workers:
+                process.join()
+            worker_id, exitcode = failed[0]
+            raise RuntimeError(f"il worker {worker_id} e' terminato con codice {exitcode} senza consegnare i risultati")
+
+def train_q_learning_parallel(env, episodes=1000000, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_decay=0.995, min_epsilon=0.05,
+                              num_workers=None, mode="hogwild", merge_every=1000, seed=None, metrics=None):
+    if mode not in ("hogwild", "merge"):
+        raise ValueError(f"mode deve essere 'hogwild' o 'merge', non {mode!r}")
+    num_workers = num_workers or os.cpu_count()
+    if metrics is None:
+        metrics = TrainingMetrics()
+    shape = (env.grid_size,) * 6 + (4,)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    try:
+        shared_q = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        shared_q[:] = 0
+
+        # Ogni worker decade epsilon come se gli episodi degli altri worker fossero suoi,
+        # così la schedule complessiva resta quella di train_q_learning
+        worker_decay = epsilon_decay ** num_workers
+        lock = mp.Lock()
+        results = mp.Queue()
+        workers = []
+        # Uno stream indipendente per worker: con lo stesso seed ogni worker rigioca gli stessi episodi
+        worker_seeds = np.random.SeedSequence(seed).spawn(num_workers)
+        start = time.perf_counter()
+        for worker_id in range(num_workers):
+            worker_episodes = episodes // num_workers + (1 if worker_id < episodes % num_workers else 0)
+            process = mp.Process(target=_train_worker, args=(
+                worker_id, shm.name, env.grid_size, env.distance, worker_episodes, alpha, gamma, epsilon, worker_decay, min_epsilon,
+                mode, merge_every, lock, results, worker_seeds[worker_id], metrics.log_every))
+            process.start()
+            workers.append(process)
+
+        finished = [None] * num_workers
+        total_steps = 0
+        while None in finished:
+            message = _next_result(results, workers, finished)
+            if message[0] == "episodes":
+                _, _, rewards, lengths, successes, worker_epsilon = message
+                metrics.record_batch(rewards, lengths, successes, worker_epsilon)
+                continue
+            _, worker_id, worker_episodes, steps, elapsed = message
+            finished[worker_id] = elapsed
+            total_steps += steps
+            print(f"⚙️ Worker {worker_id}: {worker_episodes} episodi, {steps} passi, "
+                  f"{worker_episodes / elapsed:.0f} episodi/s, {steps / elapsed:.0f} passi/s")
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        print(f"⚙️ Totale: {episodes} episodi su {num_workers} worker, {total_steps / elapsed:.0f} passi/s")
+
+        q_table = shared_q.copy()
+        del shared_q
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return q_table, metrics
@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+
+# Risolutori esatti per CatMouseCheeseEnv: la dinamica e' nota (il gatto sceglie
+# uniformemente tra le sue mosse valide, formaggio e muri sono fissi), quindi la Q-table
+# ottima si calcola con backup di Bellman vettoriali invece di campionare episodi.
+# Il risultato ha la stessa forma (g,)*6 + (4,) usata da test_q_learning e calculate_accuracy;
+# gli stati non raggiungibili (sovrapposizioni, muri) restano a zero.
+
+def _build_model(env, gamma):
+    # Compatta il modello di env.transition_model() in ricompensa attesa R[s, a],
+    # pesi scontati W[s, a, k] = gamma * p(k) per le transizioni non terminali e indici
+    # dei successori nell'elenco degli stati (non nella Q-table piatta, che e' molto piu' grande):
+    # gli stati con lo stesso formaggio sono contigui e i loro successori restano nello stesso blocco
+    states, next_states, prob, reward, done = env.transition_model()
+    position = np.zeros(env.grid_size ** 6, dtype=np.int64)
+    position[states] = np.arange(len(states))
+    expected_reward = np.einsum("sk,sak->sa", prob, reward)
+    weights = gamma * prob[:, None, :] * ~done
+    next_states = np.where(done, 0, position[next_states])
+    return states, next_states, expected_reward, weights
+
+def _backup(value, next_states, expected_reward, weights):
+    return expected_reward + np.einsum("sak,sak->sa", weights, value.take(next_states))
+
+def _max_q(q):
+    return np.maximum(np.maximum(q[:, 0], q[:, 1]), np.maximum(q[:, 2], q[:, 3]))
+
+def value_iteration(env, gamma=0.95, tol=1e-6, max_iterations=10000):
+    start = time.perf_counter()
+    shape = (env.grid_size,) * 6
+    states, next_states, expected_reward, weights = _build_model(env, gamma)
+    value = np.zeros(len(states))
+
+    for iteration in range(1, max_iterations + 1):
+        q = _backup(value, next_states, expected_reward, weights)
+        new_value = _max_q(q)
+        delta = np.max(np.abs(new_value - value))
+        value = new_value
+        if delta < tol:
+            break
+
+    q_table = np.zeros(shape + (4,))
+    q_table.reshape(-1, 4)[states] = _backup(value, next_states, expected_reward, weights)
+    print(f"🧮 Value iteration: {iteration} iterazioni, delta {delta:.2e}, {time.perf_counter() - start:.1f}s")
+    return q_table
+
+def policy_iteration(env, gamma=0.95, tol=1e-6, max_iterations=100, max_evaluation_iterations=10000):
+    start = time.perf_counter()
+    shape = (env.grid_size,) * 6
+    states, next_states, expected_reward, weights = _build_model(env, gamma)
+    rows = np.arange(len(states))
+    value = np.zeros(len(states))
+    policy = np.zeros(len(states), dtype=np.int64)
+
+    for iteration in range(1, max_iterations + 1):
+        # Valutazione iterativa della politica corrente, partendo dai valori precedenti
+        policy_next, policy_weights = next_states[rows, policy], weights[rows, policy]
+        policy_reward = expected_reward[rows, policy]
+        for _ in range(max_evaluation_iterations):
+            new_value = policy_reward + np.einsum("sk,sk->s", policy_weights, value.take(policy_next))
+            delta = np.max(np.abs(new_value - value))
+            value = new_value
+            if delta < tol:
+                break
+
+        q = _backup(value, next_states, expected_reward, weights)
+        new_policy = q.argmax(axis=1)
+        # Cambia azione solo se il miglioramento supera la tolleranza (evita oscillazioni tra pari)
+        improved = q[rows, new_policy] > q[rows, policy] + tol
+        if not improved.any():
+            break
+        policy[improved] = new_policy[improved]
+
+    q_table = np.zeros(shape + (4,))
+    q_table.reshape(-1, 4)[states] = q
+    print(f"🧮 Policy iteration: {iteration} iterazioni, {time.perf_counter() - start:.1f}s")
+    return q_table
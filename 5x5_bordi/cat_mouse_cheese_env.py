@@ -1,14 +1,56 @@
 import gymnasium as gym
 import numpy as np
-import random
+from maze_distances import load_distances
+
+# Casualita' degli ambienti e dell'addestramento: ogni ambiente ha il suo np.random.Generator
+# (env.np_random, riseminato da reset(seed=...)) invece del modulo globale random.
+# UniformStream estrae i numeri uniformi in [0, 1) a blocchi con una sola chiamata vettoriale
+# e li serve uno alla volta come float Python, cosi' il ciclo scalare non paga una chiamata al
+# generatore per ogni numero; spawn_generators crea stream indipendenti (uno per worker).
+
+class UniformStream:
+    def __init__(self, generator, block=4096):
+        self.generator = generator
+        self.block = block
+        self._values = iter(())
+
+    def __call__(self):
+        for value in self._values:
+            return value
+        self._values = iter(self.generator.random(self.block).tolist())
+        return next(self._values)
+
+def spawn_generators(seed, count):
+    # seed: intero, None o np.random.SeedSequence (per esempio uno dei figli di uno spawn precedente)
+    sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in sequence.spawn(count)]
 
 class CatMouseCheeseEnv(gym.Env):
-    def __init__(self, grid_size=5):
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 30}
+    # Nome della variante e ordine delle entita' nello stato (salvati nell'header delle Q-table)
+    variant = "5x5_bordi"
+    state_order = ("mouse", "cheese", "cat")
+
+    def __init__(self, grid_size=5, render_mode=None, observation="coords", distance="manhattan"):
         super(CatMouseCheeseEnv, self).__init__()
         self.grid_size = grid_size
+        self.render_mode = render_mode
+        self._renderer = None
+        self.observation = observation
+        self.random_stream = None
+        # Celle visitate dal topo (penalita' per le rivisite): bit `cella` di un intero Python fino a
+        # 11x11 (121 celle), un bytearray con un byte per cella oltre (vedi visited_cells)
+        self._visited_bits = grid_size * grid_size <= 121
         self.action_space = gym.spaces.Discrete(4)  # 0: Up, 1: Down, 2: Left, 3: Right
-        self.observation_space = gym.spaces.Box(low=0, high=grid_size-1, shape=(6,), dtype=np.int32)
+        if observation == "index":
+            self.observation_space = gym.spaces.Discrete(grid_size ** 6)
+        else:
+            self.observation_space = gym.spaces.Box(low=0, high=grid_size-1, shape=(6,), dtype=np.int32)
         self.walls = self._generate_walls()
+        self._compile_walls()
+        self._compile_distances(distance)
+        self._compile_state_index()
+        self._detect_symmetries()
         self.reset()
 
     def _generate_walls(self):
@@ -42,23 +84,148 @@ class CatMouseCheeseEnv(gym.Env):
 
         return walls
 
+    def _compile_walls(self):
+        # Compila i muri una sola volta in tabelle dense indicizzate per cella (i * grid_size + j):
+        # next_cell[cella, azione] e' la cella di arrivo (la stessa se la mossa e' bloccata),
+        # cat_moves[cella, :cat_move_count[cella]] sono le celle raggiungibili dal gatto.
+        moves = {0: (-1, 0), 1: (1, 0), 2: (0, -1), 3: (0, 1)}
+        num_cells = self.grid_size * self.grid_size
+        self.next_cell = np.empty((num_cells, 4), dtype=np.int64)
+        self.cat_move_mask = np.zeros((num_cells, 4), dtype=bool)
+        self.cat_moves = np.empty((num_cells, 4), dtype=np.int64)
+        self.cat_move_count = np.empty(num_cells, dtype=np.int64)
+        self.free_cells = np.arange(num_cells)
+        for cell in range(num_cells):
+            i, j = divmod(cell, self.grid_size)
+            valid = []
+            for action in range(4):
+                ni, nj = i + moves[action][0], j + moves[action][1]
+                if (0 <= ni < self.grid_size and 0 <= nj < self.grid_size and
+                        self._can_move([i, j], action)):
+                    self.next_cell[cell, action] = ni * self.grid_size + nj
+                    self.cat_move_mask[cell, action] = True
+                    valid.append(ni * self.grid_size + nj)
+                else:
+                    self.next_cell[cell, action] = cell
+            # Senza mosse valide il gatto resta fermo
+            self.cat_move_count[cell] = max(len(valid), 1)
+            self.cat_moves[cell] = (valid + [cell] * 4)[:4]
+
+        # Copie in liste Python per il percorso scalare di reset() e step()
+        self._next_cell = self.next_cell.tolist()
+        self._cat_targets = [self.cat_moves[cell, :self.cat_move_count[cell]].tolist() for cell in range(num_cells)]
+        self._free_positions = [divmod(cell, self.grid_size) for cell in self.free_cells.tolist()]
+
+    def _compile_distances(self, distance):
+        # Distanze minime nel labirinto tra tutte le coppie di celle, distances[c1, c2] (vedi
+        # maze_distances.py), disponibili anche per valutazione e pianificazione. Con
+        # distance="maze" le ricompense legate alle distanze usano queste invece della distanza di
+        # Manhattan, che ignora muri e ostacoli. reward_distances e' la tabella (int64) usata
+        # dalle ricompense nel codice vettoriale (BatchCatMouseCheeseEnv, transition_model)
+        if distance not in ("manhattan", "maze"):
+            raise ValueError(f"distance deve essere 'manhattan' o 'maze', non {distance!r}")
+        self.distance = distance
+        self.distances = load_distances(self.grid_size, self.next_cell)
+        if distance == "maze":
+            self._distance_rows = self.distances.tolist()
+            self._distance = self._maze_distance
+            self.reward_distances = self.distances.astype(np.int64)
+        else:
+            self._distance = self._manhattan_distance
+            i, j = np.divmod(np.arange(self.grid_size * self.grid_size), self.grid_size)
+            self.reward_distances = np.abs(i[:, None] - i[None, :]) + np.abs(j[:, None] - j[None, :])
+
+    def _compile_state_index(self):
+        # Indice piatto dello stato (observation="index" e self.state_index): con c = i * g + j la
+        # cella di ogni entita', nell'ordine di state_order, indice = c1 * g^4 + c2 * g^2 + c3.
+        # Coincide con np.ravel_multi_index(osservazione, (g,) * 6), cioe' con la riga di
+        # q_table.reshape(-1, 4) che corrisponde a q_table[obs[0], ..., obs[5]]
+        weights = {name: self.grid_size ** (4 - 2 * k) for k, name in enumerate(self.state_order)}
+        self._mouse_weight, self._cat_weight, self._cheese_weight = weights["mouse"], weights["cat"], weights["cheese"]
+        self._strides = np.array([self.grid_size ** k for k in range(5, -1, -1)], dtype=np.int64)
+
+    def _detect_symmetries(self):
+        # Rotazioni e riflessioni del quadrato che lasciano invariata la dinamica (mosse del topo e
+        # del gatto, celle libere); le ricompense dipendono solo da distanze (di Manhattan o nel labirinto),
+        # visite e stati terminali, quindi sono invariate anch'esse. Per ognuna: permutazione delle celle
+        # cells[c] e delle azioni actions[a], con t(next_cell[c, a]) == next_cell[t(c), actions[a]].
+        # L'identita' e' sempre la prima.
+        g = self.grid_size
+        i, j = np.divmod(np.arange(g * g), g)
+        flip_rows = ((g - 1 - i) * g + j, np.array([1, 0, 2, 3]))
+        flip_cols = (i * g + (g - 1 - j), np.array([0, 1, 3, 2]))
+        transpose = (j * g + i, np.array([2, 3, 0, 1]))
+        group = [(np.arange(g * g), np.arange(4))]
+        for cells2, actions2 in (flip_rows, flip_cols, transpose):
+            group += [(cells2[cells], actions2[actions]) for cells, actions in group]
+
+        free = np.zeros(g * g, dtype=bool)
+        free[self.free_cells] = True
+        self.symmetries = [(cells, actions) for cells, actions in group
+                           if np.array_equal(cells[self.next_cell], self.next_cell[cells][:, actions])
+                           and np.array_equal(self.cat_move_mask, self.cat_move_mask[cells][:, actions])
+                           and np.array_equal(free, free[cells])]
+        self.symmetry_actions = np.array([actions for _, actions in self.symmetries])
+
+    def canonical_states(self, index):
+        # Rappresentante canonico dell'orbita di ogni stato (l'indice piatto minimo tra le sue
+        # immagini) e numero k della simmetria che lo produce: Q(s, a) = Q(canonico, symmetry_actions[k, a])
+        index = np.asarray(index, dtype=np.int64)
+        num_cells = self.grid_size * self.grid_size
+        first, rest = np.divmod(index, num_cells * num_cells)
+        second, third = np.divmod(rest, num_cells)
+        canonical = index.copy()
+        transform = np.zeros(index.shape, dtype=np.int8)
+        for k, (cells, _) in enumerate(self.symmetries[1:], 1):
+            image = (cells[first] * num_cells + cells[second]) * num_cells + cells[third]
+            smaller = image < canonical
+            canonical = np.where(smaller, image, canonical)
+            transform[smaller] = k
+        return canonical, transform
+
+    def encode_state(self, obs):
+        # Osservazione (6,) o lotto (n, 6) di coordinate -> indice piatto
+        return np.asarray(obs, dtype=np.int64) @ self._strides
+
+    def decode_state(self, index):
+        # Indice piatto (o array di indici) -> coordinate nell'ordine dell'osservazione
+        return np.stack(np.unravel_index(index, (self.grid_size,) * 6), axis=-1).astype(np.int32)
+
+    def set_generator(self, generator):
+        # Usa `generator` (per esempio uno stream di spawn_generators) per tutta la casualita' dell'ambiente
+        self.np_random = generator
+        self.random_stream = UniformStream(generator)
+
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        self.mouse_pos = [random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)]
-        self.cat_pos = [random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)]
-        while self.cat_pos == self.mouse_pos:
-            self.cat_pos = [random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)]
-        self.cheese_pos = [random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)]
-        while self.cat_pos == self.cheese_pos or self.mouse_pos == self.cheese_pos:
-            self.cheese_pos = [random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)]
-        self.visited_positions = set()
-        self.last_distance = self._manhattan_distance(self.mouse_pos, self.cheese_pos)
+        if seed is not None or self.random_stream is None:
+            self.set_generator(self.np_random)
+        # Tre celle libere distinte estratte uniformemente: topo, gatto, formaggio
+        uniform = self.random_stream
+        n = len(self._free_positions)
+        mouse = int(uniform() * n)
+        cat = int(uniform() * (n - 1))
+        cat += cat >= mouse
+        cheese = int(uniform() * (n - 2))
+        cheese += cheese >= min(mouse, cat)
+        cheese += cheese >= max(mouse, cat)
+        self.mouse_pos, self.cat_pos, self.cheese_pos = (list(self._free_positions[k]) for k in (mouse, cat, cheese))
+        self.visited = 0 if self._visited_bits else bytearray(self.grid_size * self.grid_size)
+        self.last_distance = self._distance(self.mouse_pos, self.cheese_pos)
+        self._cheese_term = (self.cheese_pos[0] * self.grid_size + self.cheese_pos[1]) * self._cheese_weight
+        self.state_index = (self._cheese_term + (self.mouse_pos[0] * self.grid_size + self.mouse_pos[1]) * self._mouse_weight
+                            + (self.cat_pos[0] * self.grid_size + self.cat_pos[1]) * self._cat_weight)
+        if self.observation == "index":
+            return self.state_index, {}
         state = np.array([self.mouse_pos[0], self.mouse_pos[1], self.cheese_pos[0], self.cheese_pos[1], self.cat_pos[0], self.cat_pos[1]], dtype=np.int32)
         return state, {}
 
     def _manhattan_distance(self, pos1, pos2):
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
+    def _maze_distance(self, pos1, pos2):
+        return self._distance_rows[pos1[0] * self.grid_size + pos1[1]][pos2[0] * self.grid_size + pos2[1]]
+
     def _can_move(self, pos, action):
         i, j = pos
         if action == 0 and self.walls[(i, j)]["top"]:
@@ -72,36 +239,29 @@ class CatMouseCheeseEnv(gym.Env):
         return True
 
     def step(self, action):
-        moves = {0: (-1, 0), 1: (1, 0), 2: (0, -1), 3: (0, 1)}
-        old_mouse_pos = self.mouse_pos.copy()
-        old_cat_pos = self.cat_pos.copy()
-        new_mouse_pos = [self.mouse_pos[0] + moves[action][0], self.mouse_pos[1] + moves[action][1]]
+        old_mouse_pos = self.mouse_pos
+        old_cat_pos = self.cat_pos
+        mouse_cell = self._next_cell[self.mouse_pos[0] * self.grid_size + self.mouse_pos[1]][action]
+        self.mouse_pos = list(divmod(mouse_cell, self.grid_size))
 
-        if (0 <= new_mouse_pos[0] < self.grid_size and 0 <= new_mouse_pos[1] < self.grid_size and
-                self._can_move(self.mouse_pos, action)):
-            self.mouse_pos = new_mouse_pos
-
-        revisit_penalty = -0.5 if tuple(self.mouse_pos) in self.visited_positions else 0
-        self.visited_positions.add(tuple(self.mouse_pos))
+        if self._visited_bits:
+            seen = self.visited >> mouse_cell & 1
+            self.visited |= 1 << mouse_cell
+        else:
+            seen = self.visited[mouse_cell]
+            self.visited[mouse_cell] = 1
+        revisit_penalty = -0.5 if seen else 0
         idle_penalty = -0.3 if self.mouse_pos == old_mouse_pos else 0
-        current_distance = self._manhattan_distance(self.mouse_pos, self.cheese_pos)
+        current_distance = self._distance(self.mouse_pos, self.cheese_pos)
         distance_reward = (self.last_distance - current_distance) * 0.5
         self.last_distance = current_distance
 
-        # Generare una lista di azioni valide per il gatto
-        valid_cat_actions = []
-        for cat_action in range(4):
-            new_cat_pos = [self.cat_pos[0] + moves[cat_action][0], self.cat_pos[1] + moves[cat_action][1]]
-            if (0 <= new_cat_pos[0] < self.grid_size and 0 <= new_cat_pos[1] < self.grid_size and
-                    self._can_move(self.cat_pos, cat_action)):
-                valid_cat_actions.append(cat_action)
-
-        # Scegliere casualmente un'azione dalla lista di azioni valide
-        if valid_cat_actions:
-            cat_action = random.choice(valid_cat_actions)
-            self.cat_pos = [self.cat_pos[0] + moves[cat_action][0], self.cat_pos[1] + moves[cat_action][1]]
+        # Scegliere casualmente tra le celle raggiungibili dal gatto (precompilate)
+        cat_targets = self._cat_targets[self.cat_pos[0] * self.grid_size + self.cat_pos[1]]
+        cat_cell = cat_targets[int(self.random_stream() * len(cat_targets))]
+        self.cat_pos = list(divmod(cat_cell, self.grid_size))
 
-        distance_to_cat = self._manhattan_distance(self.mouse_pos, self.cat_pos)
+        distance_to_cat = self._distance(self.mouse_pos, self.cat_pos)
         if distance_to_cat <= 2:
             reward = - (3 - distance_to_cat)
 
@@ -115,5 +275,195 @@ class CatMouseCheeseEnv(gym.Env):
             reward = 30
             done = True
 
+        self.state_index = self._cheese_term + mouse_cell * self._mouse_weight + cat_cell * self._cat_weight
+        if self.observation == "index":
+            return self.state_index, reward, done, False, {}
         next_state = np.array([self.mouse_pos[0], self.mouse_pos[1], self.cheese_pos[0], self.cheese_pos[1], self.cat_pos[0], self.cat_pos[1]], dtype=np.int32)
-        return next_state, reward, done, False, {}
\ No newline at end of file
+        return next_state, reward, done, False, {}
+
+    def visited_cells(self):
+        # Celle visitate nell'episodio corrente come array bool (num_celle,)
+        num_cells = self.grid_size * self.grid_size
+        if self._visited_bits:
+            packed = np.frombuffer(self.visited.to_bytes((num_cells + 7) // 8, "little"), dtype=np.uint8)
+            return np.unpackbits(packed, bitorder="little")[:num_cells].astype(bool)
+        return np.frombuffer(self.visited, dtype=np.uint8).astype(bool)
+
+    def visited_words(self):
+        # La stessa maschera in parole uint64 come una riga di BatchCatMouseCheeseEnv.visited
+        # (bit cella & 63 della parola cella >> 6), per riprodurre la penalita' nel codice a lotti
+        cells = self.visited_cells()
+        padded = np.zeros(-(-len(cells) // 64) * 64, dtype=bool)
+        padded[:len(cells)] = cells
+        return np.packbits(padded, bitorder="little").view("<u8").astype(np.uint64)
+
+    def transition_rewards(self, mouse, cat, new_mouse, new_cat, cheese, seen):
+        # Ricompensa e terminazione di un passo con le regole di step, in forma vettoriale: celle
+        # del topo e del gatto prima e dopo la mossa, formaggio e se la cella d'arrivo del topo era
+        # gia' stata visitata (la penalita' di rivisita dipende dalla storia dell'episodio)
+        d = self.reward_distances
+        idle = new_mouse == mouse
+        caught = (new_mouse == new_cat) | ((new_mouse == cat) & (new_cat == mouse))
+        found = ~caught & (new_mouse == cheese)
+        distance_reward = (d[mouse, cheese] - d[new_mouse, cheese]) * 0.5
+        reward = -0.1 + distance_reward + np.where(seen, -0.5, 0) + np.where(idle, -0.3, 0)
+        reward = np.where(caught, -30.0, np.where(found, 30.0, reward))
+        return reward, caught | found
+
+    def transition_model(self):
+        # Modello esatto delle transizioni per la programmazione dinamica (vedi value_iteration.py).
+        # Stati: tutte le terne (topo, gatto, formaggio) su celle libere con il topo separato
+        # da gatto e formaggio (il gatto puo' stare sul formaggio). Per ogni stato, azione del
+        # topo e mossa k del gatto (probabilita' 1 / cat_move_count) restituisce indice piatto
+        # dello stato successivo nella Q-table (g,)*6, ricompensa e terminazione.
+        # Approssimazione: la penalita' di rivisita dipende dalla storia dell'episodio; qui viene
+        # applicata solo quando il topo resta fermo (l'unico caso in cui la rivisita e' certa).
+        g = self.grid_size
+        free = self.free_cells
+        # Il formaggio varia piu' lentamente: gli stati con lo stesso formaggio sono contigui
+        cheese, mouse, cat = (a.ravel() for a in np.meshgrid(free, free, free, indexing="ij"))
+        valid = (mouse != cat) & (mouse != cheese)
+        mouse, cat, cheese = mouse[valid], cat[valid], cheese[valid]
+
+        prob = (np.arange(4) < self.cat_move_count[cat][:, None]) / self.cat_move_count[cat][:, None]
+        new_mouse = self.next_cell[mouse][:, :, None]
+        new_cat = self.cat_moves[cat][:, None, :]
+        old_mouse, old_cat, cheese3 = mouse[:, None, None], cat[:, None, None], cheese[:, None, None]
+
+        reward, done = self.transition_rewards(old_mouse, old_cat, new_mouse, new_cat, cheese3, new_mouse == old_mouse)
+
+        states = mouse * g ** 4 + cheese * g ** 2 + cat
+        next_states = new_mouse * g ** 4 + cheese3 * g ** 2 + new_cat
+        return states, next_states, prob, reward, done
+
+    def render(self):
+        # "human": finestra pygame; "rgb_array": frame (altezza, larghezza, 3) disegnato senza finestra.
+        # graphics (e quindi pygame) viene importato solo qui, non negli ambienti usati per l'addestramento
+        if self.render_mode is None:
+            return None
+        if self._renderer is None:
+            from graphics import Renderer
+            self._renderer = Renderer(self.grid_size, self.walls, headless=self.render_mode == "rgb_array")
+        self._renderer.draw(self.mouse_pos, self.cat_pos, self.cheese_pos)
+        if self.render_mode == "rgb_array":
+            return self._renderer.rgb_array()
+        return None
+
+    def close(self):
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+
+
+class BatchCatMouseCheeseEnv:
+    # N episodi indipendenti tenuti in array di interi (celle i * grid_size + j)
+    # e avanzati tutti insieme da una sola chiamata vettoriale a step().
+    # Le regole di ricompensa sono identiche a CatMouseCheeseEnv.step.
+    # Con max_steps gli episodi ancora in corso dopo max_steps passi vengono troncati.
+    # visited[corsia] e' la maschera delle celle visitate (bit cella & 63 della parola cella >> 6),
+    # nello stesso formato di CatMouseCheeseEnv.visited_words().
+    # Con observation="index" le osservazioni sono gli indici piatti degli stati (vedi CatMouseCheeseEnv).
+    def __init__(self, num_envs, grid_size=5, seed=None, max_steps=None, observation="coords", distance="manhattan"):
+        self.num_envs = num_envs
+        self.grid_size = grid_size
+        self.max_steps = max_steps
+        self.observation = observation
+        self.num_cells = grid_size * grid_size
+        self.env = CatMouseCheeseEnv(grid_size, distance=distance)
+        self.rng = np.random.default_rng(seed)
+        self.lanes = np.arange(num_envs)
+        self.rows = np.arange(self.num_cells, dtype=np.int32) // grid_size
+        self.cols = np.arange(self.num_cells, dtype=np.int32) % grid_size
+        self.spawn_cells = self.env.free_cells
+        self.next_cell = self.env.next_cell
+        self.cat_moves = self.env.cat_moves
+        self.cat_move_count = self.env.cat_move_count
+        self.reward_distances = self.env.reward_distances
+
+        self.mouse = np.zeros(num_envs, dtype=np.int64)
+        self.cat = np.zeros(num_envs, dtype=np.int64)
+        self.cheese = np.zeros(num_envs, dtype=np.int64)
+        self.done = np.zeros(num_envs, dtype=bool)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.visited = np.zeros((num_envs, (self.num_cells + 63) // 64), dtype=np.uint64)
+        self.last_distance = np.zeros(num_envs, dtype=np.int64)
+        self.reset()
+
+    def _distance(self, a, b):
+        return self.reward_distances[a, b]
+
+    def _reset_lanes(self, lanes):
+        # Tre celle distinte estratte uniformemente: topo, gatto, formaggio
+        n = len(self.spawn_cells)
+        m = self.rng.integers(n, size=len(lanes))
+        c = self.rng.integers(n - 1, size=len(lanes))
+        c += c >= m
+        low, high = np.minimum(m, c), np.maximum(m, c)
+        f = self.rng.integers(n - 2, size=len(lanes))
+        f += f >= low
+        f += f >= high
+        self.mouse[lanes] = self.spawn_cells[m]
+        self.cat[lanes] = self.spawn_cells[c]
+        self.cheese[lanes] = self.spawn_cells[f]
+        self.steps[lanes] = 0
+        self.visited[lanes] = 0
+        self.last_distance[lanes] = self._distance(self.mouse[lanes], self.cheese[lanes])
+
+    def _observe(self, lanes=slice(None)):
+        mouse, cat, cheese = self.mouse[lanes], self.cat[lanes], self.cheese[lanes]
+        if self.observation == "index":
+            return mouse * self.env._mouse_weight + cat * self.env._cat_weight + cheese * self.env._cheese_weight
+        return np.stack([self.rows[mouse], self.cols[mouse],
+                         self.rows[cheese], self.cols[cheese],
+                         self.rows[cat], self.cols[cat]], axis=1)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_lanes(self.lanes)
+        return self._observe(), {}
+
+    def step(self, actions):
+        # Gli episodi terminati vengono resettati subito: l'osservazione finale
+        # resta disponibile in info["final_obs"]
+        actions = np.asarray(actions, dtype=np.int64)
+        old_mouse, old_cat = self.mouse, self.cat
+        mouse = self.next_cell[old_mouse, actions]
+
+        word = mouse >> 6
+        bit = np.left_shift(np.uint64(1), (mouse & 63).astype(np.uint64))
+        seen = (self.visited[self.lanes, word] & bit) != 0
+        self.visited[self.lanes, word] |= bit
+        revisit_penalty = np.where(seen, -0.5, 0)
+        idle_penalty = np.where(mouse == old_mouse, -0.3, 0)
+        current_distance = self._distance(mouse, self.cheese)
+        distance_reward = (self.last_distance - current_distance) * 0.5
+        self.last_distance = current_distance
+
+        choice = (self.rng.random(self.num_envs) * self.cat_move_count[old_cat]).astype(np.int64)
+        cat = self.cat_moves[old_cat, choice]
+
+        reward = -0.1 + distance_reward + revisit_penalty + idle_penalty
+        caught = (mouse == cat) | ((mouse == old_cat) & (cat == old_mouse))
+        found = ~caught & (mouse == self.cheese)
+        reward = np.where(caught, -30.0, np.where(found, 30.0, reward))
+        self.done = caught | found
+
+        self.steps += 1
+        if self.max_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = ~self.done & (self.steps >= self.max_steps)
+        episode_steps = self.steps.copy()
+
+        self.mouse, self.cat = mouse, cat
+        final_obs = self._observe()
+        obs = final_obs
+        finished = self.done | truncated
+        if finished.any():
+            reset_lanes = np.flatnonzero(finished)
+            self._reset_lanes(reset_lanes)
+            obs = final_obs.copy()
+            obs[reset_lanes] = self._observe(reset_lanes)
+        info = {"final_obs": final_obs, "caught": caught, "found": found, "episode_steps": episode_steps}
+        return obs, reward, self.done, truncated, info
@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+from evaluation import evaluate_policy
+from sparse_q_table import SparseQTable
+
+# Arresto anticipato dell'addestramento: ogni check_every episodi si misura di quanto e' cambiata
+# la Q-table dal controllo precedente (massimo e media di |dQ| sulle righe gia' aggiornate almeno
+# una volta) e si valuta la politica greedy su eval_episodes episodi (evaluate_policy, sempre con
+# lo stesso seed, cosi' i controlli si confrontano sugli stessi episodi iniziali). L'addestramento
+# si ferma dopo patience controlli consecutivi in cui il tasso di successo non ha superato il
+# migliore di almeno min_improvement, purche' anche la variazione media di Q abbia smesso di
+# scendere: meno di q_plateau (in frazione) rispetto a patience controlli prima. Con epsilon
+# minimo e alpha costante |dQ| non va mai a zero ma si assesta su un rumore di fondo, la cui
+# scala dipende dalle ricompense della variante, per questo il criterio e' relativo
+# (q_plateau=None: conta solo il tasso di successo). Prima di min_episodes non si ferma mai.
+#
+#   convergence = ConvergenceMonitor(check_every=10000, patience=5)
+#   q_table, metrics = train_q_learning(env, convergence=convergence)
+#   print(convergence.format_report())
+#
+# Lo stato del monitor (state_dict) finisce nei checkpoint di train_q_learning e resume_q_learning
+# lo ripristina, cosi' un addestramento ripreso si ferma allo stesso episodio di uno senza interruzioni.
+
+class ConvergenceMonitor:
+    def __init__(self, check_every=10000, eval_episodes=5000, patience=5, min_improvement=0.002, q_plateau=0.05,
+                 min_episodes=0, max_steps=500, seed=0):
+        self.check_every = check_every
+        self.eval_episodes = eval_episodes
+        self.patience = patience
+        self.min_improvement = min_improvement
+        self.q_plateau = q_plateau
+        self.min_episodes = min_episodes
+        self.max_steps = max_steps
+        self.seed = seed
+        self.history = []
+        self.best_success = -1.0
+        self.best_episode = 0
+        self.stale = 0
+        self.stopped_at = None
+        self.reason = None
+        self._previous = None
+
+    def state_dict(self):
+        # Parametri e avanzamento; gli array di _previous non vengono mai modificati, solo sostituiti
+        settings = ("check_every", "eval_episodes", "patience", "min_improvement", "q_plateau", "min_episodes",
+                    "max_steps", "seed")
+        return {
+            "settings": {name: getattr(self, name) for name in settings},
+            "history": [dict(entry) for entry in self.history],
+            "best_success": self.best_success, "best_episode": self.best_episode, "stale": self.stale,
+            "stopped_at": self.stopped_at, "reason": self.reason, "previous": self._previous,
+        }
+
+    def load_state_dict(self, state):
+        # Riprende l'avanzamento salvato mantenendo i parametri di questo monitor
+        self.history = [dict(entry) for entry in state["history"]]
+        self.best_success, self.best_episode, self.stale = state["best_success"], state["best_episode"], state["stale"]
+        self.stopped_at, self.reason, self._previous = state["stopped_at"], state["reason"], state["previous"]
+
+    @classmethod
+    def from_state(cls, state):
+        monitor = cls(**state["settings"])
+        monitor.load_state_dict(state)
+        return monitor
+
+    def due(self, episodes_done):
+        # Vero se tra l'ultimo controllo ed episodes_done e' passato un blocco di check_every episodi
+        last = self.history[-1]["episode"] if self.history else 0
+        return episodes_done // self.check_every > last // self.check_every
+
+    def _snapshot(self, q_table):
+        # (chiavi, righe): per la SparseQTable le chiavi degli stati memorizzati, per la tabella densa None
+        if isinstance(q_table, SparseQTable):
+            return q_table.items()
+        return None, np.array(q_table, dtype=np.float64).reshape(-1, 4)
+
+    def _q_change(self, keys, rows):
+        old_keys, old_rows = self._previous if self._previous is not None else (keys, np.zeros_like(rows))
+        if keys is None:
+            change = np.abs(rows - old_rows)
+            updated = np.any(rows != 0, axis=1)
+        else:
+            # Le righe nuove cambiano rispetto a zero
+            _, new_index, old_index = np.intersect1d(keys, old_keys, assume_unique=True, return_indices=True)
+            previous = np.zeros_like(rows)
+            previous[new_index] = old_rows[old_index]
+            change = np.abs(rows - previous)
+            updated = np.ones(len(rows), dtype=bool)
+        if not updated.any():
+            return 0.0, 0.0
+        return float(change.max()), float(change[updated].mean())
+
+    def check(self, episodes_done, env, q_table):
+        # Registra un controllo; ritorna True se l'addestramento deve fermarsi
+        start = time.perf_counter()
+        keys, rows = self._snapshot(q_table)
+        max_change, mean_change = self._q_change(keys, rows)
+        self._previous = keys, rows
+        results = evaluate_policy(env, q_table, episodes=self.eval_episodes, max_steps=self.max_steps, seed=self.seed)
+        success = results["success_rate"]
+        # best_success e' l'ultimo miglioramento di almeno min_improvement, non il massimo assoluto:
+        # tanti piccoli passi sotto la soglia non azzerano il conteggio
+        if success > self.best_success + self.min_improvement:
+            self.best_success, self.best_episode = success, episodes_done
+            self.stale = 0
+        else:
+            self.stale += 1
+        self.history.append({"episode": episodes_done, "success_rate": success, "max_q_change": max_change,
+                             "mean_q_change": mean_change, "seconds": time.perf_counter() - start})
+
+        if self.q_plateau is None:
+            q_settled = True
+        else:
+            earlier = self.history[-1 - self.patience]["mean_q_change"] if len(self.history) > self.patience else float("inf")
+            q_settled = mean_change > (1 - self.q_plateau) * earlier
+        if self.stale >= self.patience and q_settled and episodes_done >= self.min_episodes:
+            self.stopped_at = episodes_done
+            self.reason = (f"da {self.stale} controlli il successo non supera di {self.min_improvement * 100:.2f} punti "
+                           f"il {self.best_success * 100:.2f}% dell'episodio {self.best_episode} (ultimo {success * 100:.2f}%)")
+            if self.q_plateau is not None:
+                self.reason += (f", variazione media di Q {mean_change:.4f} (era {earlier:.4f} {self.patience} controlli "
+                                f"prima, calo < {self.q_plateau * 100:.0f}%)")
+            return True
+        return False
+
+    def format_report(self):
+        lines = [f"   episodio {entry['episode']:>9}: successo {entry['success_rate'] * 100:6.2f}% | "
+                 f"max |dQ| {entry['max_q_change']:9.4f} | media |dQ| {entry['mean_q_change']:.4f}"
+                 for entry in self.history]
+        if self.stopped_at is None:
+            lines.append("⏳ Nessun arresto anticipato: budget di episodi esaurito")
+        else:
+            lines.append(f"🛑 Arresto anticipato all'episodio {self.stopped_at}: {self.reason}")
+        return "\n".join(lines)
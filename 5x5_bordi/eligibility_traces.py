@@ -0,0 +1,98 @@
+import numpy as np
+
+# Tracce di eleggibilita' sparse per Q(lambda): invece di un array di tracce grande come la
+# Q-table si tengono solo le coppie (stato, azione) toccate nell'episodio, in array
+# preallocati di indici piatti (stato * 4 + azione) e valori; azzerarle costa O(coppie toccate).
+# Le tracce sono "replacing": una coppia rivisitata torna a 1. Dopo ogni passo tutte le tracce
+# decadono di gamma * lambda; quelle scese sotto min_trace vengono scartate.
+#   "watkins": le tracce si azzerano quando l'azione scelta non e' quella greedy (esplorazione)
+#   "peng":    Q(lambda) di Peng e Williams: le tracce non si azzerano mai e ogni passo applica
+#              due errori, r + gamma * max Q(s') - Q(s, a) alla coppia corrente e
+#              r + gamma * max Q(s') - max Q(s) alle coppie tracciate nei passi precedenti
+#              (update_peng); impara piu' in fretta ma non e' off-policy esatta
+
+TRACE_KINDS = ("watkins", "peng")
+
+class SparseTraces:
+    # Tracce di un singolo episodio (train_q_learning)
+    def __init__(self, capacity=256, min_trace=1e-4):
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.value = np.zeros(capacity)
+        self.min_trace = min_trace
+        self.size = 0
+        self.slot = {}
+
+    def __len__(self):
+        return self.size
+
+    def visit(self, index):
+        slot = self.slot.get(index)
+        if slot is None:
+            if self.size == len(self.index):
+                self._compact()
+            slot = self.size
+            self.size += 1
+            self.slot[index] = slot
+            self.index[slot] = index
+        self.value[slot] = 1.0
+
+    def _compact(self):
+        # Scarta le tracce trascurabili; se non basta raddoppia gli array
+        keep = np.flatnonzero(self.value[:self.size] >= self.min_trace)
+        self.size = len(keep)
+        self.index[:self.size] = self.index[keep]
+        self.value[:self.size] = self.value[keep]
+        self.slot = dict(zip(self.index[:self.size].tolist(), range(self.size)))
+        if self.size == len(self.index):
+            self.index = np.concatenate([self.index, np.zeros_like(self.index)])
+            self.value = np.concatenate([self.value, np.zeros_like(self.value)])
+
+    def update(self, flat_q, delta, decay):
+        # Watkins: q[coppie tracciate] += delta * traccia, poi le tracce decadono di decay (gamma * lambda)
+        n = self.size
+        flat_q[self.index[:n]] += delta * self.value[:n]
+        self.value[:n] *= decay
+
+    def update_peng(self, flat_q, index, current_delta, earlier_delta, decay):
+        # Peng: le tracce decadono, le coppie dei passi precedenti ricevono earlier_delta * traccia,
+        # la coppia corrente current_delta; poi la coppia corrente entra nelle tracce
+        n = self.size
+        self.value[:n] *= decay
+        flat_q[self.index[:n]] += earlier_delta * self.value[:n]
+        flat_q[index] += current_delta
+        self.visit(index)
+
+    def clear(self):
+        self.size = 0
+        self.slot.clear()
+
+class BatchTraces:
+    # Tracce di num_envs episodi paralleli (train_q_learning_batch): per ogni episodio un buffer
+    # circolare di length coppie in ordine di visita. Una coppia rivisitata viene rimossa dalla
+    # vecchia posizione e riaccodata, quindi l'elemento sovrascritto e' sempre il piu' vecchio,
+    # cioe' quello con la traccia piu' piccola ((gamma * lambda) ** length)
+    def __init__(self, num_envs, length=64, min_trace=1e-4):
+        self.index = np.zeros((num_envs, length), dtype=np.int64)
+        self.value = np.zeros((num_envs, length))
+        self.head = np.zeros(num_envs, dtype=np.int64)
+        self.lanes = np.arange(num_envs)
+        self.min_trace = min_trace
+
+    def visit(self, index):
+        self.value[self.index == index[:, None]] = 0
+        self.index[self.lanes, self.head] = index
+        self.value[self.lanes, self.head] = 1.0
+        self.head = (self.head + 1) % self.index.shape[1]
+
+    def active(self):
+        # (episodio, indice piatto, traccia) delle tracce non nulle; dopo decay(), prima di visit()
+        # sono le coppie dei passi precedenti (per l'errore di Peng)
+        lane, position = np.nonzero(self.value)
+        return lane, self.index[lane, position], self.value[lane, position]
+
+    def decay(self, decay):
+        self.value *= decay
+        self.value[self.value < self.min_trace] = 0
+
+    def clear(self, lanes):
+        self.value[lanes] = 0
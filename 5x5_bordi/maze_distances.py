@@ -0,0 +1,61 @@
+import hashlib
+import os
+from collections import deque
+
+import numpy as np
+
+# Distanze minime tra tutte le coppie di celle sul grafo delle mosse (next_cell), con una BFS
+# per cella: distances[c1, c2] e' il numero minimo di mosse da c1 a c2, tenendo conto di muri e
+# ostacoli. La matrice e' uint8 (uint16 se qualche distanza supera 254) e le celle non
+# raggiungibili valgono il massimo del dtype. Il risultato viene salvato in una cache su disco
+# (CAT_MOUSE_CHEESE_CACHE, di default ~/.cache/cat_mouse_cheese) con chiave l'hash della
+# disposizione, cosi' ogni disposizione si calcola una volta sola.
+
+CACHE_DIR = os.environ.get("CAT_MOUSE_CHEESE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "cat_mouse_cheese"))
+
+def layout_hash(grid_size, next_cell):
+    digest = hashlib.sha1(str(grid_size).encode())
+    digest.update(np.ascontiguousarray(next_cell, dtype=np.int64).tobytes())
+    return digest.hexdigest()[:16]
+
+def all_pairs_distances(next_cell):
+    num_cells = len(next_cell)
+    neighbours = [sorted(set(targets) - {cell}) for cell, targets in enumerate(np.asarray(next_cell).tolist())]
+    distances = np.empty((num_cells, num_cells), dtype=np.int64)
+    for source in range(num_cells):
+        row = [-1] * num_cells
+        row[source] = 0
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            for neighbour in neighbours[cell]:
+                if row[neighbour] < 0:
+                    row[neighbour] = row[cell] + 1
+                    queue.append(neighbour)
+        distances[source] = row
+    dtype = np.uint8 if distances.max() < 255 else np.uint16
+    distances[distances < 0] = np.iinfo(dtype).max
+    return distances.astype(dtype)
+
+def load_distances(grid_size, next_cell, cache_dir=CACHE_DIR):
+    # Dalla cache se presente, altrimenti calcolate e salvate (scrittura atomica con os.replace);
+    # cache_dir=None disattiva la cache, una cartella non scrivibile viene ignorata
+    if cache_dir is None:
+        return all_pairs_distances(next_cell)
+    path = os.path.join(cache_dir, f"distances_{layout_hash(grid_size, next_cell)}.npy")
+    try:
+        distances = np.load(path)
+        if distances.shape == (len(next_cell),) * 2:
+            return distances
+    except (OSError, ValueError):
+        pass
+    distances = all_pairs_distances(next_cell)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, distances)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+    return distances
@@ -0,0 +1,150 @@
+import csv
+import time
+
+import numpy as np
+
+# Metriche di addestramento in memoria costante: le ultime `window` ricompense, lunghezze ed
+# esiti stanno in buffer circolari float32 preallocati e ogni `log_every` episodi viene emesso un
+# record riassuntivo (media/min/max sulla finestra, tasso di successo, lunghezza media, epsilon,
+# passi al secondo). I record vengono anche scritti subito su un file CSV, che si puo' leggere
+# (e disegnare con plot_learning_curve) mentre l'addestramento e' ancora in corso.
+
+FIELDS = ("episode", "mean_reward", "min_reward", "max_reward", "success_rate", "mean_length",
+          "epsilon", "steps_per_sec", "elapsed")
+
+class TrainingMetrics:
+    def __init__(self, window=1000, log_every=1000, filename=None):
+        self.window = window
+        self.log_every = log_every
+        self.filename = filename
+        self.rewards = np.zeros(window, dtype=np.float32)
+        self.lengths = np.zeros(window, dtype=np.float32)
+        self.successes = np.zeros(window, dtype=np.float32)
+        self.episodes = 0
+        self.total_steps = 0
+        self.epsilon = float("nan")
+        self.records = []
+        self.start_time = time.perf_counter()
+        self._last_time = self.start_time
+        self._last_steps = 0
+        self._file = None
+        self._writer = None
+        if filename is not None:
+            self._file = open(filename, "w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(FIELDS)
+            self._file.flush()
+
+    def record(self, reward, length, success, epsilon):
+        position = self.episodes % self.window
+        self.rewards[position] = reward
+        self.lengths[position] = length
+        self.successes[position] = success
+        self.episodes += 1
+        self.total_steps += length
+        self.epsilon = epsilon
+        if self.episodes % self.log_every == 0:
+            self._emit()
+
+    def record_batch(self, rewards, lengths, successes, epsilon):
+        # Versione vettoriale di record() per gli episodi conclusi nello stesso tick: il lotto si
+        # divide ai multipli di log_every e per ogni confine superato si emette un record con la
+        # finestra e il numero di episodi di quel confine, come farebbe record(). I record dello
+        # stesso tick hanno i passi al secondo medi dall'ultimo record alla fine del lotto
+        rewards, lengths, successes = np.asarray(rewards), np.asarray(lengths), np.asarray(successes)
+        count = len(rewards)
+        if count == 0:
+            return
+        self.epsilon = epsilon
+        first = (self.episodes // self.log_every + 1) * self.log_every - self.episodes
+        boundaries = range(first, count + 1, self.log_every)
+        if boundaries:
+            interval = time.perf_counter() - self._last_time
+            steps = self.total_steps + int(np.sum(lengths)) - self._last_steps
+            steps_per_sec = steps / interval if interval > 0 else float("nan")
+        start = 0
+        for end in boundaries:
+            self._store(rewards[start:end], lengths[start:end], successes[start:end])
+            self._emit(steps_per_sec)
+            start = end
+        self._store(rewards[start:], lengths[start:], successes[start:])
+
+    def _store(self, rewards, lengths, successes):
+        count = len(rewards)
+        keep = min(count, self.window)
+        positions = (self.episodes + count - keep + np.arange(keep)) % self.window
+        self.rewards[positions] = rewards[count - keep:]
+        self.lengths[positions] = lengths[count - keep:]
+        self.successes[positions] = successes[count - keep:]
+        self.episodes += count
+        self.total_steps += int(np.sum(lengths))
+
+    def summary(self, steps_per_sec=None):
+        filled = min(self.episodes, self.window)
+        now = time.perf_counter()
+        interval = now - self._last_time
+        if filled == 0:
+            return dict.fromkeys(FIELDS, float("nan")) | {"episode": 0}
+        return {
+            "episode": self.episodes,
+            "mean_reward": float(self.rewards[:filled].mean()),
+            "min_reward": float(self.rewards[:filled].min()),
+            "max_reward": float(self.rewards[:filled].max()),
+            "success_rate": float(self.successes[:filled].mean()),
+            "mean_length": float(self.lengths[:filled].mean()),
+            "epsilon": self.epsilon,
+            "steps_per_sec": steps_per_sec if steps_per_sec is not None
+                             else (self.total_steps - self._last_steps) / interval if interval > 0 else float("nan"),
+            "elapsed": now - self.start_time,
+        }
+
+    def _emit(self, steps_per_sec=None):
+        record = self.summary(steps_per_sec)
+        self.records.append(tuple(record[field] for field in FIELDS))
+        self._last_time = time.perf_counter()
+        self._last_steps = self.total_steps
+        if self._writer is not None:
+            self._writer.writerow([f"{record[field]:.6g}" for field in FIELDS])
+            self._file.flush()
+
+    def state_dict(self):
+        # Copia dello stato per i checkpoint (vedi checkpoint.py); i tempi non vengono salvati
+        return {
+            "window": self.window, "log_every": self.log_every, "filename": self.filename,
+            "rewards": self.rewards.copy(), "lengths": self.lengths.copy(), "successes": self.successes.copy(),
+            "episodes": self.episodes, "total_steps": self.total_steps, "epsilon": self.epsilon,
+            "records": list(self.records),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        # Riprende da un checkpoint: il CSV viene riscritto con i soli record salvati, scartando
+        # quelli emessi dopo il checkpoint da un'esecuzione interrotta
+        metrics = cls(state["window"], state["log_every"], state["filename"])
+        for name in ("rewards", "lengths", "successes"):
+            getattr(metrics, name)[:] = state[name]
+        metrics.episodes = state["episodes"]
+        metrics.total_steps = metrics._last_steps = state["total_steps"]
+        metrics.epsilon = state["epsilon"]
+        metrics.records = list(state["records"])
+        if metrics.records:
+            metrics.start_time -= metrics.records[-1][FIELDS.index("elapsed")]
+        if metrics._writer is not None:
+            metrics._writer.writerows([f"{value:.6g}" for value in record] for record in metrics.records)
+            metrics._file.flush()
+        return metrics
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+def load_metrics(source):
+    # Record come array strutturato da un TrainingMetrics o da un file CSV (anche parziale)
+    dtype = [(field, np.float64) for field in FIELDS]
+    if isinstance(source, TrainingMetrics):
+        return np.array(source.records, dtype=dtype)
+    with open(source, newline="") as file:
+        rows = [tuple(float(value) for value in row) for row in list(csv.reader(file))[1:] if len(row) == len(FIELDS)]
+    return np.array(rows, dtype=dtype)
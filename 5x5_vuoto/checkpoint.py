@@ -0,0 +1,66 @@
+import os
+import pickle
+import copy
+import queue
+import threading
+
+import numpy as np
+
+# Checkpoint dell'addestramento: stato (dizionario serializzabile con pickle) seguito dalla
+# Q-table in formato .npy, scritti in un file temporaneo e poi rinominati con os.replace, cosi'
+# un'interruzione durante la scrittura lascia intatto il checkpoint precedente.
+
+def save_checkpoint(path, q_table, state):
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        np.save(file, q_table)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+def load_checkpoint(path):
+    with open(path, "rb") as file:
+        state = pickle.load(file)
+        q_table = np.load(file)
+    return q_table, state
+
+def capture_rng_state(env, agent_stream):
+    # Copie degli stream casuali usati durante l'addestramento (generatore e numeri gia' estratti
+    # ma non ancora usati): quello dell'ambiente e quello della scelta epsilon-greedy
+    return {"env": copy.deepcopy(env.random_stream), "agent": copy.deepcopy(agent_stream)}
+
+def restore_rng_state(env, state):
+    # Ripristina lo stream dell'ambiente e restituisce quello dell'agente
+    env.np_random = state["env"].generator
+    env.random_stream = state["env"]
+    return state["agent"]
+
+class CheckpointWriter:
+    # Scrive i checkpoint in un thread separato: save() copia la Q-table (una memcpy) e ritorna
+    # subito; se la scrittura precedente e' ancora in coda, aspetta che parta (al massimo una in attesa)
+    def __init__(self, path):
+        self.path = path
+        self.error = None
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, q_table, state):
+        self._pending.put((np.array(q_table, copy=True), state))
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            try:
+                save_checkpoint(self.path, *item)
+            except Exception as error:
+                self.error = error
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
@@ -1,7 +1,10 @@
+import os
 import pygame
 import numpy as np
 
 # Constants for the game
+# Le immagini sono nella cartella della variante, qualunque sia la cartella corrente
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "img")
 CELL_SIZE = 100
 
 def init_graphics(grid_size):
@@ -13,9 +16,9 @@ def init_graphics(grid_size):
     return window, clock
 
 def load_images():
-    mouse_img = pygame.image.load("img/mouse.png")
-    cat_img = pygame.image.load("img/cat.png")
-    cheese_img = pygame.image.load("img/cheese.png")
+    mouse_img = pygame.image.load(os.path.join(IMG_DIR, "mouse.png"))
+    cat_img = pygame.image.load(os.path.join(IMG_DIR, "cat.png"))
+    cheese_img = pygame.image.load(os.path.join(IMG_DIR, "cheese.png"))
     return mouse_img, cat_img, cheese_img
 
 def draw_grid(window, grid_size):
@@ -57,4 +60,49 @@ def render_entities(window, mouse_pos, cat_pos, cheese_pos, walls, grid_size, mo
     pygame.display.flip()  # Update the display
 
 def quit_graphics():
-    pygame.quit()
\ No newline at end of file
+    pygame.quit()
+
+class Renderer:
+    # Disegno con cache: gli sprite vengono scalati una volta sola, griglia e muri stanno in una
+    # Surface di sfondo e a ogni frame si ridisegnano solo le celle cambiate (dirty rect).
+    # Con headless=True si usa il driver SDL "dummy": nessuna finestra, i frame si leggono con
+    # rgb_array() o si salvano con save_frame()
+    def __init__(self, grid_size, walls, headless=False):
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+        self.headless = headless
+        self.window, self.clock = init_graphics(grid_size)
+        self.sprites = [pygame.transform.scale(img, (CELL_SIZE, CELL_SIZE)).convert_alpha() for img in load_images()]
+        self.background = pygame.Surface(self.window.get_size()).convert()
+        self.background.fill((255, 255, 255))
+        draw_grid(self.background, grid_size)
+        draw_walls(self.background, walls, grid_size)
+        self._drawn = []
+        self.window.blit(self.background, (0, 0))
+        if not headless:
+            pygame.display.flip()
+
+    def draw(self, mouse_pos, cat_pos, cheese_pos):
+        # Ripristina lo sfondo sotto gli sprite del frame precedente e disegna quelli nuovi
+        # (nello stesso ordine di render_entities); ritorna i rettangoli aggiornati
+        dirty = self._drawn
+        for rect in dirty:
+            self.window.blit(self.background, rect, rect)
+        self._drawn = []
+        for sprite, (i, j) in zip(self.sprites, (mouse_pos, cat_pos, cheese_pos)):
+            self._drawn.append(self.window.blit(sprite, (j * CELL_SIZE, i * CELL_SIZE)))
+        dirty = dirty + self._drawn
+        if not self.headless:
+            pygame.display.update(dirty)
+        return dirty
+
+    def rgb_array(self):
+        # Frame corrente come array (altezza, larghezza, 3) uint8
+        return pygame.surfarray.array3d(self.window).transpose(1, 0, 2)
+
+    def save_frame(self, filename):
+        pygame.image.save(self.window, filename)
+
+    def close(self):
+        pygame.quit()
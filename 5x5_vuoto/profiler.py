@@ -0,0 +1,170 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+import numpy as np
+
+# Strumentazione opzionale del ciclo di train_q_learning: tempo e numero di chiamate per fase
+# (reset, scelta dell'azione, step dell'ambiente, aggiornamento della Q-table, contabilita' di
+# fine episodio), istogramma delle lunghezze degli episodi e passi al secondo. Ogni
+# sample_every episodi si possono campionare sample_episodes episodi con cProfile e/o fare
+# un'istantanea di tracemalloc (senza sample_every cProfile copre tutto l'addestramento e
+# l'istantanea si fa alla fine). Senza profiler il ciclo di addestramento paga solo un test
+# su una variabile locale per fase.
+#
+#   profiler = TrainingProfiler(sample_every=10000, cprofile=True, trace_memory=True, report_file="profile.json")
+#   q_table, metrics = train_q_learning(env, profiler=profiler)
+#   print(profiler.format_report())
+
+RESET, ACTION, STEP, UPDATE, BOOKKEEPING = range(5)
+PHASES = ("reset", "action", "step", "update", "bookkeeping")
+
+class TrainingProfiler:
+    def __init__(self, sample_every=None, sample_episodes=1, cprofile=False, trace_memory=False, max_length=1000,
+                 top=15, report_file=None):
+        self.sample_every = sample_every
+        self.sample_episodes = sample_episodes
+        self.max_length = max_length
+        self.top = top
+        self.report_file = report_file
+        self.seconds = [0.0] * len(PHASES)
+        self.calls = [0] * len(PHASES)
+        # lengths[k]: episodi lunghi k passi; l'ultima voce raccoglie quelli da max_length passi in su
+        self.lengths = [0] * (max_length + 1)
+        self.episodes = 0
+        self.steps = 0
+        self.samples = []
+        self.profile = cProfile.Profile() if cprofile else None
+        self.trace_memory = trace_memory
+        self._sampling_until = None
+        self._started_tracing = False
+        self._start = self._last = None
+        self._elapsed = 0.0
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.profile is not None and not self.sample_every:
+            self.profile.enable()
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, phase):
+        # Attribuisce a `phase` il tempo trascorso dall'ultima chiamata
+        now = time.perf_counter()
+        self.seconds[phase] += now - self._last
+        self.calls[phase] += 1
+        self._last = now
+
+    def begin_episode(self, episode):
+        if self.sample_every and episode % self.sample_every == 0 and self._sampling_until is None:
+            self._sampling_until = episode + self.sample_episodes
+            if self.profile is not None:
+                self.profile.enable()
+        self._last = time.perf_counter()
+
+    def end_episode(self, episode, steps):
+        self.episodes += 1
+        self.steps += steps
+        self.lengths[min(steps, self.max_length)] += 1
+        if self._sampling_until is not None and episode + 1 >= self._sampling_until:
+            if self.profile is not None:
+                self.profile.disable()
+            self._sampling_until = None
+            self._take_sample(episode + 1)
+        self._last = time.perf_counter()
+
+    def _take_sample(self, episode):
+        sample = {"episode": episode, "steps_per_sec": self.steps / max(self.elapsed, 1e-12)}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:self.top]
+            sample |= {"memory_current": current, "memory_peak": peak,
+                       "memory_top": [{"location": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                                      for stat in statistics]}
+        self.samples.append(sample)
+
+    def stop(self):
+        if self._start is None:
+            return
+        if self.profile is not None and (self._sampling_until is not None or not self.sample_every):
+            self.profile.disable()
+        self._sampling_until = None
+        self._elapsed = self.elapsed
+        self._start = None
+        if self.trace_memory:
+            self._take_sample(self.episodes)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self.report_file is not None:
+            self.save_report(self.report_file)
+
+    @property
+    def elapsed(self):
+        return self._elapsed if self._start is None else self._elapsed + time.perf_counter() - self._start
+
+    def length_percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        counts = np.array(self.lengths)
+        if counts.sum() == 0:
+            return {f"p{round(q * 100)}": float("nan") for q in quantiles}
+        cumulative = np.cumsum(counts) / counts.sum()
+        return {f"p{round(q * 100)}": int(np.searchsorted(cumulative, q)) for q in quantiles}
+
+    def report(self):
+        # Riepilogo serializzabile in JSON; si puo' chiedere in qualsiasi momento, anche ad addestramento in corso
+        elapsed = self.elapsed
+        measured = sum(self.seconds)
+        phases = {name: {"seconds": seconds, "calls": calls, "share": seconds / measured if measured else 0.0,
+                         "mean_us": seconds / calls * 1e6 if calls else 0.0}
+                  for name, seconds, calls in zip(PHASES, self.seconds, self.calls)}
+        report = {
+            "elapsed": elapsed,
+            "episodes": self.episodes,
+            "steps": self.steps,
+            "steps_per_sec": self.steps / elapsed if elapsed else 0.0,
+            "episodes_per_sec": self.episodes / elapsed if elapsed else 0.0,
+            "mean_length": self.steps / self.episodes if self.episodes else 0.0,
+            "length_percentiles": self.length_percentiles(),
+            "length_histogram": {"max_length": self.max_length, "counts": list(self.lengths)},
+            "phases": phases,
+            "samples": self.samples,
+        }
+        if self.profile is not None:
+            report["cprofile"] = self.profile_text()
+        return report
+
+    def profile_text(self, sort="cumulative"):
+        if self.profile is None or not self.profile.getstats():
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats(sort).print_stats(self.top)
+        return stream.getvalue()
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"⏱️ {report['episodes']} episodi, {report['steps']} passi in {report['elapsed']:.2f}s "
+                 f"({report['steps_per_sec']:.0f} passi/s, {report['episodes_per_sec']:.1f} episodi/s)",
+                 f"👣 Lunghezza media {report['mean_length']:.1f} passi, "
+                 + ", ".join(f"{name} {value}" for name, value in report["length_percentiles"].items())]
+        for name, phase in report["phases"].items():
+            lines.append(f"   {name:<12} {phase['seconds']:9.3f}s {phase['share'] * 100:5.1f}% "
+                         f"{phase['calls']:>10} chiamate {phase['mean_us']:8.2f} µs/chiamata")
+        for sample in report["samples"]:
+            if "memory_current" in sample:
+                lines.append(f"🧠 Episodio {sample['episode']}: memoria {sample['memory_current'] / 2 ** 20:.1f} MB "
+                             f"(picco {sample['memory_peak'] / 2 ** 20:.1f} MB)")
+        if report.get("cprofile"):
+            lines.append(report["cprofile"])
+        return "\n".join(lines)
+
+    def save_report(self, filename):
+        # .json: report() completo; altrimenti il testo di format_report()
+        with open(filename, "w") as file:
+            if filename.endswith(".json"):
+                json.dump(self.report(), file, indent=2)
+            else:
+                file.write(self.format_report())
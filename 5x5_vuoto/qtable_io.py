@@ -0,0 +1,110 @@
+import json
+import pickle
+import struct
+
+import numpy as np
+from sparse_q_table import SparseQTable
+
+# Formato binario per le Q-table (estensione .qtab):
+#   8 byte   magic b"CMCQTAB\0"
+#   4 byte   lunghezza dell'header (uint32 little endian)
+#   header   JSON con version, grid_size, variant, state_order, dtype, shape, layout
+#   padding  fino a un multiplo di 64 byte, poi i dati
+# layout "dense":  la tabella intera in ordine C, apribile con np.memmap senza copie
+# layout "sparse": solo le righe visitate (almeno un valore diverso da zero): prima gli
+#                  indici di riga (index_dtype), poi le righe (num_rows, 4) allineate a 64 byte
+# I file .pkl del vecchio formato continuano a essere letti (e scritti, se richiesto).
+# Una SparseQTable viene sempre salvata con layout "sparse" e si puo' ricaricare come tale
+# (load_q_table(..., sparse=True)) senza passare dalla tabella densa.
+
+MAGIC = b"CMCQTAB\x00"
+VERSION = 1
+ALIGNMENT = 64
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def save_q_table(q_table, filename, variant=None, state_order=None, dtype=np.float32, sparse=False):
+    if filename.endswith(".pkl"):
+        with open(filename, "wb") as file:
+            pickle.dump(q_table.to_dense() if isinstance(q_table, SparseQTable) else np.asarray(q_table), file)
+        return
+
+    if isinstance(q_table, SparseQTable):
+        shape = q_table.shape
+        rows, values = q_table.items()
+        sparse = True
+    else:
+        q_table = np.asarray(q_table)
+        shape = q_table.shape
+        flat = q_table.reshape(-1, shape[-1])
+        if sparse:
+            rows = np.flatnonzero(np.any(flat != 0, axis=1))
+            values = flat[rows]
+    dtype = np.dtype(dtype).newbyteorder("<")
+    header = {
+        "version": VERSION,
+        "grid_size": shape[0],
+        "variant": variant,
+        "state_order": list(state_order) if state_order is not None else None,
+        "dtype": dtype.str,
+        "shape": list(shape),
+        "layout": "sparse" if sparse else "dense",
+    }
+    if sparse:
+        index_dtype = np.dtype("<u4") if np.prod(shape[:-1], dtype=np.float64) <= 2 ** 32 else np.dtype("<u8")
+        header["num_rows"] = len(rows)
+        header["index_dtype"] = index_dtype.str
+        blocks = [rows.astype(index_dtype), values.astype(dtype)]
+    else:
+        blocks = [flat.astype(dtype, copy=False)]
+
+    encoded = json.dumps(header).encode("utf-8")
+    with open(filename, "wb") as file:
+        file.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        for block in blocks:
+            file.write(b"\x00" * (_align(file.tell()) - file.tell()))
+            file.write(np.ascontiguousarray(block).tobytes())
+
+def read_header(filename):
+    # None se il file non e' nel formato binario (cioe' e' un vecchio pickle)
+    with open(filename, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return None
+        (length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(length).decode("utf-8"))
+    header["data_offset"] = _align(len(MAGIC) + 4 + length)
+    return header
+
+def load_q_table(filename, mmap_mode="r", variant=None, sparse=False):
+    # Con mmap_mode ("r", "c", "r+") una tabella densa viene mappata in memoria senza copie;
+    # con mmap_mode=None viene letta interamente. Le tabelle sparse vengono ricostruite dense,
+    # oppure, con sparse=True, qualunque tabella viene caricata come SparseQTable
+    header = read_header(filename)
+    if header is None:
+        with open(filename, "rb") as file:
+            q_table = pickle.load(file)
+        return SparseQTable.from_dense(q_table) if sparse else q_table
+    if variant is not None and header["variant"] not in (None, variant):
+        raise ValueError(f"{filename} contiene una Q-table per {header['variant']}, non per {variant}")
+
+    shape = tuple(header["shape"])
+    dtype = np.dtype(header["dtype"])
+    offset = header["data_offset"]
+    if header["layout"] == "dense":
+        if sparse:
+            return SparseQTable.from_dense(np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape))
+        if mmap_mode is not None:
+            return np.memmap(filename, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape)
+        return np.fromfile(filename, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+    num_rows = header["num_rows"]
+    index_dtype = np.dtype(header["index_dtype"])
+    rows = np.fromfile(filename, dtype=index_dtype, count=num_rows, offset=offset)
+    values_offset = _align(offset + num_rows * index_dtype.itemsize)
+    values = np.fromfile(filename, dtype=dtype, count=num_rows * shape[-1], offset=values_offset)
+    if sparse:
+        return SparseQTable.from_rows(shape[0], rows.astype(np.int64), values.reshape(num_rows, shape[-1]))
+    q_table = np.zeros(shape, dtype=dtype)
+    q_table.reshape(-1, shape[-1])[rows] = values.reshape(num_rows, shape[-1])
+    return q_table
@@ -0,0 +1,169 @@
+import numpy as np
+
+# Q-table sparsa per griglie grandi: la tabella densa (g,)*6 + (4,) cresce come g^6 (32 MB a g=10,
+# 1.2 GB a g=20), ma la maggior parte degli stati non viene mai visitata. Qui si tengono solo le
+# righe toccate, in una tabella hash a indirizzamento aperto (scansione lineare) con chiave
+# l'indice piatto dello stato (obs @ strides, int64) e valore una riga float32 di 4 azioni.
+# Le operazioni sono vettoriali su lotti di stati; gli stati mai aggiornati valgono zero.
+# Con max_rows le righe usate meno di recente vengono scartate quando si supera il limite
+# (circa 2 * (8 + 8 + 4 * 4) = 64 byte per riga con float32, al fattore di carico massimo 0.5).
+
+EMPTY = -1
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+class SparseQTable:
+    def __init__(self, grid_size, capacity=1 << 16, max_rows=None, dtype=np.float32):
+        self.grid_size = grid_size
+        self.shape = (grid_size,) * 6 + (4,)
+        self.dtype = np.dtype(dtype)
+        self.max_rows = max_rows
+        self.strides = np.array([grid_size ** k for k in range(5, -1, -1)], dtype=np.int64)
+        self.evicted = 0
+        self._clock = 0
+        self._allocate(max(16, 1 << (int(capacity) - 1).bit_length()))
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._shift = np.uint64(64 - (capacity.bit_length() - 1))
+        self._keys = np.full(capacity, EMPTY, dtype=np.int64)
+        self._rows = np.zeros((capacity, 4), dtype=self.dtype)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self._keys.nbytes + self._rows.nbytes + self._last_used.nbytes
+
+    def _hash(self, keys):
+        # Hash moltiplicativo (Fibonacci): i bit alti del prodotto modulo 2^64
+        return (keys.astype(np.uint64) * _GOLDEN >> self._shift).astype(np.int64)
+
+    def _find(self, keys):
+        # Slot di ogni chiave, -1 se assente
+        slots = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        probe = self._hash(keys)
+        mask = self.capacity - 1
+        while len(pending):
+            stored = self._keys[probe]
+            hit = stored == keys[pending]
+            slots[pending[hit]] = probe[hit]
+            again = ~hit & (stored != EMPTY)
+            pending, probe = pending[again], (probe[again] + 1) & mask
+        return slots
+
+    def _insert(self, keys):
+        # Inserisce chiavi distinte non presenti; piu' chiavi che puntano allo stesso slot vuoto
+        # lo contendono, ne vince una e le altre proseguono la scansione
+        slots = np.empty(len(keys), dtype=np.int64)
+        pending = np.arange(len(keys))
+        probe = self._hash(keys)
+        mask = self.capacity - 1
+        while len(pending):
+            free = self._keys[probe] == EMPTY
+            self._keys[probe[free]] = keys[pending[free]]
+            won = self._keys[probe] == keys[pending]
+            slots[pending[won]] = probe[won]
+            pending, probe = pending[~won], (probe[~won] + 1) & mask
+        self._rows[slots] = 0
+        self.count += len(keys)
+        return slots
+
+    def _rebuild(self, capacity, keep):
+        keys, rows, last_used = self._keys[keep], self._rows[keep], self._last_used[keep]
+        self._allocate(capacity)
+        slots = self._insert(keys)
+        self._rows[slots] = rows
+        self._last_used[slots] = last_used
+
+    def _make_room(self, new_rows):
+        if self.max_rows is not None and self.count + new_rows > self.max_rows:
+            # Scarta le righe usate meno di recente, con un margine di max_rows / 8 per non
+            # ricostruire la tabella a ogni lotto
+            occupied = np.flatnonzero(self._keys != EMPTY)
+            target = max(self.max_rows - self.max_rows // 8 - new_rows, 0)
+            drop = len(occupied) - target
+            if drop > 0:
+                oldest = np.argpartition(self._last_used[occupied], drop - 1)[:drop]
+                keep = np.delete(occupied, oldest)
+                self.evicted += drop
+                self._rebuild(self.capacity, keep)
+        capacity = self.capacity
+        while 2 * (self.count + new_rows) > capacity:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._rebuild(capacity, np.flatnonzero(self._keys != EMPTY))
+
+    def keys(self, states):
+        # Indici piatti di osservazioni (n, 6) o di tuple di coordinate
+        return np.asarray(states, dtype=np.int64) @ self.strides
+
+    def get(self, keys):
+        # Righe (n, 4) per gli indici piatti `keys`; zero per gli stati mai aggiornati
+        keys = np.asarray(keys, dtype=np.int64)
+        self._clock += 1
+        slots = self._find(keys)
+        found = slots >= 0
+        rows = np.zeros((len(keys), 4), dtype=self.dtype)
+        rows[found] = self._rows[slots[found]]
+        self._last_used[slots[found]] = self._clock
+        return rows
+
+    def add(self, keys, actions, values):
+        # q[keys[k], actions[k]] += values[k], con accumulo sulle chiavi ripetute (come np.add.at)
+        keys = np.asarray(keys, dtype=np.int64)
+        self._clock += 1
+        unique, inverse = np.unique(keys, return_inverse=True)
+        slots = self._find(unique)
+        missing = slots < 0
+        if missing.any():
+            self._last_used[slots[~missing]] = self._clock
+            self._make_room(np.count_nonzero(missing))
+            slots = self._find(unique)
+            slots[slots < 0] = self._insert(unique[slots < 0])
+        np.add.at(self._rows, (slots[inverse], actions), values)
+        self._last_used[slots] = self._clock
+
+    def set(self, keys, rows):
+        # Sovrascrive righe intere (chiavi distinte)
+        keys = np.asarray(keys, dtype=np.int64)
+        self.add(keys, np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys)))
+        self._rows[self._find(keys)] = rows
+
+    def items(self):
+        # (indici piatti ordinati, righe) degli stati memorizzati
+        occupied = np.flatnonzero(self._keys != EMPTY)
+        order = np.argsort(self._keys[occupied])
+        return self._keys[occupied][order], self._rows[occupied][order]
+
+    def __getitem__(self, index):
+        # q[s0, ..., s5] -> riga di 4 valori, q[s0, ..., s5, a] -> valore: stessa sintassi della
+        # tabella densa usata da test_q_learning
+        row = self.get(self.keys([index[:6]]))[0]
+        return row if len(index) == 6 else row[index[6]]
+
+    def to_dense(self, max_bytes=2 ** 31):
+        size = int(np.prod(self.shape, dtype=np.float64)) * self.dtype.itemsize
+        if size > max_bytes:
+            raise MemoryError(f"La Q-table densa occuperebbe {size / 2 ** 20:.0f} MB (limite {max_bytes / 2 ** 20:.0f} MB)")
+        q_table = np.zeros(self.shape, dtype=self.dtype)
+        keys, rows = self.items()
+        q_table.reshape(-1, 4)[keys] = rows
+        return q_table
+
+    @classmethod
+    def from_rows(cls, grid_size, keys, rows, max_rows=None, dtype=np.float32):
+        q_table = cls(grid_size, capacity=2 * len(keys), max_rows=max_rows, dtype=dtype)
+        if len(keys):
+            q_table.set(keys, rows)
+        return q_table
+
+    @classmethod
+    def from_dense(cls, q_table, max_rows=None, dtype=np.float32):
+        q_table = np.asarray(q_table)
+        flat = q_table.reshape(-1, 4)
+        keys = np.flatnonzero(np.any(flat != 0, axis=1))
+        return cls.from_rows(q_table.shape[0], keys, flat[keys], max_rows=max_rows, dtype=dtype)
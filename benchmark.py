@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from variants import VARIANTS, import_variant
+
+# Benchmark delle parti che contano per le prestazioni, per ogni variante: passi dell'ambiente
+# (reset/step), addestramento (train_q_learning e train_q_learning_batch), calculate_accuracy,
+# salvataggio/caricamento della Q-table e disegno headless (render_entities e Renderer).
+# Ogni misura viene ripetuta `repeat` volte e si tiene la mediana; i risultati vanno in un file
+# JSON insieme ai metadati della macchina, e `compare` segnala le regressioni rispetto a un
+# file di riferimento. Convenzione sui nomi delle metriche: *_per_sec piu' alto e' meglio,
+# *_seconds e *_bytes piu' basso e' meglio. Ogni benchmark importa da solo i moduli della variante
+# che usa; un benchmark che fallisce viene registrato come mancante (null, con l'errore in
+# "errors") senza perdere gli altri risultati.
+#
+#   python benchmark.py run --output bench.json
+#   python benchmark.py compare baseline.json bench.json --threshold 0.1
+
+SCALES = {
+    "env_steps": 100000,
+    "train_episodes": 2000,
+    "batch_episodes": 20000,
+    "eval_episodes": 10000,
+    "frames": 500,
+}
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_env(variant, steps):
+    main = import_variant(variant)
+    env = main.CatMouseCheeseEnv()
+    env.reset(seed=0)
+    actions = np.random.default_rng(0).integers(4, size=steps).tolist()
+    resets = 1
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+            resets += 1
+    seconds = time.perf_counter() - start
+    _, reset_seconds = _timed(lambda: [env.reset() for _ in range(steps // 10)])
+    return {"steps_per_sec": steps / seconds, "resets_per_sec": steps // 10 / reset_seconds, "episodes": resets}
+
+def bench_train(variant, episodes):
+    main = import_variant(variant)
+    env = main.CatMouseCheeseEnv()
+    metrics = main.TrainingMetrics(log_every=episodes)
+    _, seconds = _timed(main.train_q_learning, env, episodes=episodes, metrics=metrics, seed=0)
+    return {"episodes_per_sec": episodes / seconds, "steps_per_sec": metrics.total_steps / seconds}
+
+def bench_train_batch(variant, episodes):
+    main = import_variant(variant)
+    env = main.CatMouseCheeseEnv()
+    metrics = main.TrainingMetrics(log_every=episodes)
+    _, seconds = _timed(main.train_q_learning_batch, env, episodes=episodes, metrics=metrics, seed=0)
+    return {"episodes_per_sec": episodes / seconds, "steps_per_sec": metrics.total_steps / seconds}
+
+def _sample_q_table(env):
+    # Q-table piena di valori casuali: la politica greedy non e' banale e i file non si comprimono
+    return np.random.default_rng(0).standard_normal((env.grid_size,) * 6 + (4,))
+
+def bench_accuracy(variant, episodes):
+    main = import_variant(variant)
+    env = main.CatMouseCheeseEnv()
+    q_table = _sample_q_table(env)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds = _timed(main.calculate_accuracy, env, q_table, test_episodes=episodes)
+    return {"episodes_per_sec": episodes / seconds}
+
+def bench_qtable_io(variant):
+    main = import_variant(variant)
+    env = main.CatMouseCheeseEnv()
+    q_table = _sample_q_table(env)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, extension in (("qtab", ".qtab"), ("pkl", ".pkl")):
+            filename = os.path.join(directory, f"q_table{extension}")
+            if extension == ".pkl":
+                with open(filename, "wb") as file:
+                    _, save_seconds = _timed(pickle.dump, q_table, file)
+            else:
+                _, save_seconds = _timed(main.save_q_table, q_table, filename)
+            # mmap_mode=None: la tabella viene letta davvero invece di essere solo mappata
+            loaded, load_seconds = _timed(main.load_q_table, filename, mmap_mode=None)
+            assert loaded.shape == q_table.shape
+            results[f"{name}_save_seconds"] = save_seconds
+            results[f"{name}_load_seconds"] = load_seconds
+            results[f"{name}_bytes"] = os.path.getsize(filename)
+    return results
+
+def bench_render(variant, frames):
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    main = import_variant(variant)
+    graphics = import_variant(variant, "graphics")
+    env = main.CatMouseCheeseEnv()
+    env.reset(seed=0)
+    positions = []
+    for action in np.random.default_rng(0).integers(4, size=frames).tolist():
+        _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+        positions.append((env.mouse_pos, env.cat_pos, env.cheese_pos))
+    window, _ = graphics.init_graphics(env.grid_size)
+    images = graphics.load_images()
+    start = time.perf_counter()
+    for mouse_pos, cat_pos, cheese_pos in positions:
+        graphics.render_entities(window, mouse_pos, cat_pos, cheese_pos, env.walls, env.grid_size, *images)
+    entities_seconds = time.perf_counter() - start
+    renderer = graphics.Renderer(env.grid_size, env.walls, headless=True)
+    start = time.perf_counter()
+    for mouse_pos, cat_pos, cheese_pos in positions:
+        renderer.draw(mouse_pos, cat_pos, cheese_pos)
+    renderer_seconds = time.perf_counter() - start
+    renderer.close()
+    return {"render_entities_frames_per_sec": frames / entities_seconds, "renderer_frames_per_sec": frames / renderer_seconds}
+
+def _median(samples):
+    return {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+
+def run_benchmarks(variants=VARIANTS, benchmarks=None, repeat=3, scale=1.0):
+    sizes = {name: max(1, int(size * scale)) for name, size in SCALES.items()}
+    suite = {
+        "env": lambda variant: bench_env(variant, sizes["env_steps"]),
+        "train": lambda variant: bench_train(variant, sizes["train_episodes"]),
+        "train_batch": lambda variant: bench_train_batch(variant, sizes["batch_episodes"]),
+        "accuracy": lambda variant: bench_accuracy(variant, sizes["eval_episodes"]),
+        "qtable_io": bench_qtable_io,
+        "render": lambda variant: bench_render(variant, sizes["frames"]),
+    }
+    results = {}
+    errors = {}
+    for variant in variants:
+        results[variant] = {}
+        for name in benchmarks or suite:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    samples = [suite[name](variant) for _ in range(repeat)]
+            except Exception as error:
+                results[variant][name] = None
+                errors.setdefault(variant, {})[name] = f"{type(error).__name__}: {error}"
+                print(f"⚠️ {variant} {name}: fallito ({errors[variant][name]})")
+                continue
+            results[variant][name] = _median(samples)
+            print(f"⏱️ {variant} {name}: " + ", ".join(f"{metric}={value:.4g}" for metric, value in results[variant][name].items()))
+    return {"metadata": _metadata(repeat, sizes), "results": results, "errors": errors}
+
+def _metadata(repeat, sizes):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import pygame
+        pygame_version = pygame.version.ver
+    except ImportError:
+        pygame_version = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "pygame": pygame_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "sizes": sizes,
+    }
+
+def compare(baseline, current, threshold=0.1):
+    # Variazioni relative delle metriche comuni ai due file; e' una regressione un peggioramento
+    # oltre threshold (0.1 = 10%) nel verso indicato dal nome della metrica. I benchmark mancanti
+    # (falliti) in uno dei due file non si confrontano
+    rows = []
+    for variant, benchmarks in current["results"].items():
+        for name, metrics in benchmarks.items():
+            for metric, value in (metrics or {}).items():
+                reference = (baseline["results"].get(variant, {}).get(name) or {}).get(metric)
+                if reference is None or reference == 0 or not metric.endswith(("_per_sec", "_seconds", "_bytes")):
+                    continue
+                change = value / reference - 1
+                worse = -change if metric.endswith("_per_sec") else change
+                rows.append((variant, name, metric, reference, value, change, worse > threshold))
+    return rows
+
+def _load(filename):
+    with open(filename) as file:
+        return json.load(file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark di ambiente, addestramento, valutazione, I/O e disegno")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="esegue i benchmark e scrive i risultati in JSON")
+    run.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    run.add_argument("--benchmarks", nargs="+", choices=("env", "train", "train_batch", "accuracy", "qtable_io", "render"))
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--scale", type=float, default=1.0, help="moltiplica la dimensione di ogni carico di lavoro")
+    run.add_argument("--output", default="benchmark.json")
+    check = commands.add_parser("compare", help="confronta due file di risultati e segnala le regressioni")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_benchmarks(args.variants, args.benchmarks, args.repeat, args.scale)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"💾 Risultati salvati in {args.output}")
+        return 1 if report["errors"] else 0
+
+    rows = compare(_load(args.baseline), _load(args.current), args.threshold)
+    for variant, name, metric, reference, value, change, regression in rows:
+        flag = "❌ REGRESSIONE" if regression else "✅"
+        print(f"{flag} {variant} {name} {metric}: {reference:.4g} -> {value:.4g} ({change * 100:+.1f}%)")
+    regressions = sum(row[-1] for row in rows)
+    print(f"{regressions} regressioni su {len(rows)} metriche (soglia {args.threshold * 100:.0f}%)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
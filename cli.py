@@ -0,0 +1,168 @@
+import argparse
+import sys
+
+from variants import VARIANTS, import_variant
+
+# Punto di ingresso unico per le tre varianti, al posto di commentare e scommentare righe in
+# main(). Qui si importano solo moduli della libreria standard: numpy, gymnasium e il codice della
+# variante si caricano dopo il parsing, pygame solo per `play` (e `bench`), matplotlib solo per
+# `plot`, cosi' i job headless partono in fretta e non inizializzano mai SDL.
+#
+#   python cli.py --variant 10x10_ostacoli train --mode batch --episodes 200000 --output q_table.qtab
+#   python cli.py --variant 10x10_ostacoli train --mode dqn --episodes 100000 --output dqn.npz
+#   python cli.py --variant 5x5_vuoto train --mode dyna --episodes 20000 --planning-steps 10 --prioritized
+#   python cli.py --variant 10x10_ostacoli eval q_table.qtab --episodes 100000
+#   python cli.py --variant 10x10_ostacoli play q_table.qtab --episodes 3
+#   python cli.py plot metrics.csv --output learning_curve.png
+#   python cli.py --variant 5x5_bordi bench --scale 0.5 --output bench.json
+
+TRAINING_MODES = ("sequential", "batch", "parallel", "value-iteration", "policy-iteration", "dqn", "dyna")
+
+def train(main, args):
+    env = main.CatMouseCheeseEnv()
+    metrics = main.TrainingMetrics(filename=args.metrics) if args.metrics else main.TrainingMetrics()
+    profiler = main.TrainingProfiler(report_file=args.profile) if args.profile else None
+    convergence = main.ConvergenceMonitor(check_every=args.check_every, patience=args.patience) if args.check_every else None
+    # Il DQN decade epsilon piu' lentamente: con num_envs episodi in parallelo ne conclude molti per tick
+    epsilon_decay = args.epsilon_decay if args.epsilon_decay is not None else 0.9999 if args.mode == "dqn" else 0.995
+    output = args.output or ("dqn.npz" if args.mode == "dqn" else "q_table.qtab")
+    if args.mode == "sequential" and args.resume:
+        q_table, metrics = main.resume_q_learning(env, args.checkpoint, profiler=profiler, convergence=convergence)
+    elif args.mode == "sequential":
+        q_table, metrics = main.train_q_learning(env, args.episodes, args.alpha, args.gamma, 1.0, epsilon_decay,
+                                                 args.min_epsilon, metrics=metrics, checkpoint_path=args.checkpoint,
+                                                 seed=args.seed, profiler=profiler, trace_lambda=args.trace_lambda,
+                                                 trace_kind=args.trace_kind, convergence=convergence)
+    elif args.mode == "batch":
+        q_table, metrics = main.train_q_learning_batch(env, args.episodes, args.alpha, args.gamma, 1.0, epsilon_decay,
+                                                       args.min_epsilon, num_envs=args.num_envs, seed=args.seed,
+                                                       metrics=metrics, symmetry=args.symmetry,
+                                                       trace_lambda=args.trace_lambda, trace_kind=args.trace_kind,
+                                                       convergence=convergence)
+    elif args.mode == "parallel":
+        q_table, metrics = main.train_q_learning_parallel(env, args.episodes, args.alpha, args.gamma, 1.0, epsilon_decay,
+                                                          args.min_epsilon, num_workers=args.workers, seed=args.seed,
+                                                          metrics=metrics)
+    elif args.mode == "dqn":
+        agent, metrics = main.train_dqn(env, args.episodes, args.gamma, 1.0, epsilon_decay, args.min_epsilon,
+                                        num_envs=args.num_envs, seed=args.seed, metrics=metrics)
+        metrics.close()
+        output = agent.save(output)
+        print(f"💾 Rete salvata in {output}")
+        return
+    elif args.mode == "dyna":
+        q_table, metrics = main.train_dyna_q(env, args.episodes, args.alpha, args.gamma, 1.0, epsilon_decay,
+                                             args.min_epsilon, planning_steps=args.planning_steps,
+                                             prioritized=args.prioritized, metrics=metrics, seed=args.seed)
+    elif args.mode == "value-iteration":
+        q_table = main.value_iteration(env, gamma=args.gamma)
+    else:
+        q_table = main.policy_iteration(env, gamma=args.gamma)
+    metrics.close()
+    main.save_q_table(q_table, output, dtype=args.dtype)
+    print(f"💾 Q-table salvata in {output}")
+    if profiler is not None:
+        print(profiler.format_report())
+    if convergence is not None:
+        print(convergence.format_report())
+
+def evaluate(main, args):
+    env = main.CatMouseCheeseEnv()
+    # .npz: rete salvata da `train --mode dqn`
+    q_table = main.DQNAgent.load(env, args.q_table) if args.q_table.endswith(".npz") else main.load_q_table(args.q_table)
+    results = main.evaluate_policy(env, q_table, episodes=args.episodes, max_steps=args.max_steps, seed=args.seed)
+    low, high = results["success_ci"]
+    print(f"✅ Accuratezza: {results['success_rate'] * 100:.2f}% (IC 95% {low * 100:.2f}-{high * 100:.2f}%) "
+          f"su {args.episodes} episodi di test in {results['seconds']:.2f}s")
+    print(f"   😿 Catturato: {results['caught_rate'] * 100:.2f}% | ⏱️ Troncati dopo {args.max_steps} passi: "
+          f"{results['timeout_rate'] * 100:.2f}% | 👣 Lunghezza media: {results['mean_length']:.2f} passi")
+
+def play(main, args):
+    env = main.CatMouseCheeseEnv()
+    q_table = main.load_q_table(args.q_table)
+    if args.frames:
+        main.record_rollouts(env, q_table, episodes=args.episodes, directory=args.frames)
+    else:
+        main.test_q_learning(env, q_table, episodes=args.episodes, delay=args.delay)
+
+def plot(main, args):
+    main.plot_learning_curve(args.metrics, filename=args.output, show=args.show)
+    print(f"📈 Curva di apprendimento salvata in {args.output}")
+
+def bench(main, args):
+    import json
+    import benchmark
+
+    report = benchmark.run_benchmarks([args.variant], args.benchmarks, args.repeat, args.scale)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"💾 Risultati salvati in {args.output}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gatto, topo e formaggio: addestramento, valutazione e visualizzazione")
+    parser.add_argument("--variant", choices=VARIANTS, default="5x5_vuoto")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("train", help="addestra una Q-table e la salva")
+    command.add_argument("--mode", choices=TRAINING_MODES, default="batch")
+    command.add_argument("--episodes", type=int, default=1000000)
+    command.add_argument("--alpha", type=float, default=0.1)
+    command.add_argument("--gamma", type=float, default=0.95)
+    command.add_argument("--epsilon-decay", type=float, default=None, help="default 0.995 (0.9999 con --mode dqn)")
+    command.add_argument("--min-epsilon", type=float, default=0.05)
+    command.add_argument("--num-envs", type=int, default=1024, help="episodi in parallelo con --mode batch e dqn")
+    command.add_argument("--symmetry", action="store_true", help="con --mode batch, addestra sugli stati canonici")
+    command.add_argument("--trace-lambda", type=float, default=0.0, help="con --mode sequential e batch, Q(lambda) se > 0")
+    command.add_argument("--trace-kind", choices=("watkins", "peng"), default="watkins")
+    command.add_argument("--check-every", type=int, default=None,
+                         help="con --mode sequential e batch, controlla la convergenza ogni N episodi e si ferma in anticipo")
+    command.add_argument("--patience", type=int, default=5, help="controlli senza miglioramenti prima di fermarsi")
+    command.add_argument("--planning-steps", type=int, default=10, help="backup simulati per passo reale con --mode dyna")
+    command.add_argument("--prioritized", action="store_true", help="con --mode dyna, prioritized sweeping")
+    command.add_argument("--workers", type=int, default=None, help="processi con --mode parallel")
+    command.add_argument("--seed", type=int, default=None)
+    command.add_argument("--metrics", help="file CSV delle metriche di addestramento")
+    command.add_argument("--checkpoint", help="file di checkpoint con --mode sequential")
+    command.add_argument("--resume", action="store_true", help="riprende da --checkpoint")
+    command.add_argument("--profile", help="con --mode sequential, salva il report del profiler (.json o testo)")
+    command.add_argument("--dtype", choices=("float32", "float16"), default="float32")
+    command.add_argument("--output", help="default q_table.qtab (dqn.npz con --mode dqn)")
+    command.set_defaults(handler=train)
+
+    command = commands.add_parser("eval", help="valuta la politica greedy di una Q-table (o di una rete .npz)")
+    command.add_argument("q_table")
+    command.add_argument("--episodes", type=int, default=10000)
+    command.add_argument("--max-steps", type=int, default=500)
+    command.add_argument("--seed", type=int, default=None)
+    command.set_defaults(handler=evaluate)
+
+    command = commands.add_parser("play", help="mostra episodi giocati con una Q-table")
+    command.add_argument("q_table")
+    command.add_argument("--episodes", type=int, default=10)
+    command.add_argument("--delay", type=float, default=0.5)
+    command.add_argument("--frames", help="salva i frame PNG in questa cartella invece di aprire una finestra")
+    command.set_defaults(handler=play)
+
+    command = commands.add_parser("plot", help="disegna la curva di apprendimento da un CSV di metriche")
+    command.add_argument("metrics")
+    command.add_argument("--output", default="learning_curve.png")
+    command.add_argument("--show", action="store_true", help="apre anche la finestra di matplotlib")
+    command.set_defaults(handler=plot)
+
+    command = commands.add_parser("bench", help="benchmark della variante (vedi benchmark.py)")
+    command.add_argument("--benchmarks", nargs="+", choices=("env", "train", "train_batch", "accuracy", "qtable_io", "render"))
+    command.add_argument("--repeat", type=int, default=3)
+    command.add_argument("--scale", type=float, default=1.0)
+    command.add_argument("--output", default="benchmark.json")
+    command.set_defaults(handler=bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "train" and args.resume and not args.checkpoint:
+        build_parser().error("--resume richiede --checkpoint")
+    args.handler(import_variant(args.variant), args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,463 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+import sys
+import time
+
+import numpy as np
+
+from variants import VARIANTS, import_variant
+
+# Server asyncio delle politiche addestrate: carica una Q-table una volta sola (le .qtab dense
+# vengono mappate in memoria), ne calcola la tabella delle azioni greedy (int8, un byte per stato)
+# e risponde a richieste stato -> azione su socket Unix o TCP con un protocollo binario compatto.
+# Le richieste arrivate insieme da tutte le connessioni vengono raccolte in un unico lotto e
+# risolte con una sola lookup vettoriale (MicroBatcher). La tabella si ricarica a caldo, senza
+# chiudere le connessioni, quando il file cambia su disco, con SIGHUP o con una richiesta RELOAD;
+# le richieste gia' in un lotto usano la tabella precedente.
+#
+# Protocollo: ogni messaggio e' un header di 7 byte "<BIH" (operazione, id della richiesta,
+# lunghezza n) seguito dal payload; le risposte riportano operazione e id della richiesta
+# (sulla stessa connessione si possono avere piu' richieste in volo).
+#   ACT     richiesta: n stati da 6 byte (coordinate nell'ordine state_order della variante,
+#           come gli indici di q_table[s0, ..., s5]); risposta: n byte di azioni (INVALID per
+#           gli stati fuori dalla griglia)
+#   STATS   richiesta vuota; risposta: n byte di JSON con contatori, QPS e latenze
+#   RELOAD  richiesta: percorso (UTF-8) della nuova tabella, vuoto per ricaricare la stessa;
+#           risposta: n byte di JSON con l'esito
+#   ERROR   risposta: n byte di messaggio di errore
+#
+#   python policy_server.py --variant 10x10_ostacoli serve q_table.qtab --unix /tmp/policy.sock
+#   python policy_server.py query --unix /tmp/policy.sock 0 0 9 9 5 5
+#   python policy_server.py loadgen --unix /tmp/policy.sock --clients 64 --seconds 10
+#   python policy_server.py stats --unix /tmp/policy.sock
+
+HEADER = struct.Struct("<BIH")
+ACT, STATS, RELOAD, ERROR = 0, 1, 2, 255
+INVALID = 255
+STATE_SIZE = 6
+MAX_STATES = 65535
+
+class ServerStats:
+    # Contatori del server; le latenze (dall'arrivo della richiesta alla risposta pronta, in
+    # secondi) delle ultime `window` richieste stanno in un buffer circolare per i percentili
+    def __init__(self, window=65536):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.states = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.connections = 0
+        self.total_connections = 0
+        self.errors = 0
+        self.reloads = 0
+        self.latencies = np.zeros(window)
+        self._last = (self.started, 0)
+
+    def record_batch(self, latencies, states):
+        count = len(latencies)
+        positions = (self.requests + np.arange(count)) % len(self.latencies)
+        self.latencies[positions] = latencies
+        self.requests += count
+        self.states += states
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, states)
+
+    def snapshot(self):
+        # QPS dall'avvio e dall'ultimo snapshot; latenze in microsecondi
+        now = time.perf_counter()
+        uptime = now - self.started
+        last_time, last_requests = self._last
+        self._last = (now, self.requests)
+        filled = self.latencies[:min(self.requests, len(self.latencies))] * 1e6
+        percentiles = dict(zip(("p50_us", "p90_us", "p99_us", "max_us"),
+                               np.percentile(filled, (50, 90, 99, 100)).tolist() if len(filled) else [0.0] * 4))
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "states": self.states,
+            "batches": self.batches,
+            "mean_batch": self.states / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "qps": self.requests / uptime if uptime else 0.0,
+            "recent_qps": (self.requests - last_requests) / (now - last_time) if now > last_time else 0.0,
+            "states_per_sec": self.states / uptime if uptime else 0.0,
+            "connections": self.connections,
+            "total_connections": self.total_connections,
+            "errors": self.errors,
+            "reloads": self.reloads,
+            "latency": percentiles,
+        }
+
+class PolicyTable:
+    # Tabella delle azioni greedy per indice piatto dello stato, come evaluate_policy
+    def __init__(self, variant, filename):
+        self.variant = variant
+        self.filename = os.path.abspath(filename)
+        main = import_variant(variant)
+        evaluation = import_variant(variant, "evaluation")
+        q_table = main.load_q_table(self.filename)
+        self.grid_size = q_table.shape[0]
+        self.policy = evaluation.greedy_policy(q_table).view(np.uint8)
+        del q_table
+        self.strides = self.grid_size ** np.arange(STATE_SIZE - 1, -1, -1, dtype=np.int64)
+        stat = os.stat(self.filename)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+
+    def lookup(self, states):
+        # states: (n, 6) uint8 -> azioni (n,) uint8
+        valid = np.all(states < self.grid_size, axis=1)
+        index = states.astype(np.int64) @ self.strides
+        return np.where(valid, self.policy[np.where(valid, index, 0)], INVALID).astype(np.uint8)
+
+class MicroBatcher:
+    # Raccoglie le richieste ACT e le risolve insieme: il lotto parte dopo max_delay secondi dalla
+    # prima richiesta in attesa (0: alla prossima iterazione del ciclo di eventi, cioe' con tutte
+    # le richieste gia' lette) o subito quando raggiunge max_batch stati
+    def __init__(self, server, max_batch=8192, max_delay=0.0):
+        self.server = server
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []
+        self.pending_states = 0
+        self._handle = None
+
+    def submit(self, states):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((states, future, time.perf_counter()))
+        self.pending_states += len(states)
+        if self.pending_states >= self.max_batch:
+            self.flush()
+        elif self._handle is None:
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_later(self.max_delay, self.flush) if self.max_delay else loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        pending, self.pending, self.pending_states = self.pending, [], 0
+        if not pending:
+            return
+        states = np.concatenate([item[0] for item in pending]) if len(pending) > 1 else pending[0][0]
+        actions = self.server.table.lookup(states)
+        bounds = np.cumsum([len(item[0]) for item in pending])[:-1]
+        now = time.perf_counter()
+        for (_, future, _), result in zip(pending, np.split(actions, bounds)):
+            if not future.done():
+                future.set_result(result)
+        self.server.stats.record_batch(now - np.array([item[2] for item in pending]), len(states))
+
+class PolicyServer:
+    def __init__(self, variant, filename, max_batch=8192, max_delay=0.0, reload_interval=1.0):
+        self.table = PolicyTable(variant, filename)
+        self.stats = ServerStats()
+        self.batcher = MicroBatcher(self, max_batch, max_delay)
+        self.reload_interval = reload_interval
+        self._reload_lock = None
+        self._servers = []
+
+    async def reload(self, filename=None):
+        # Carica la nuova tabella in un thread (il ciclo di eventi continua a servire con la
+        # vecchia) e la sostituisce in un colpo solo; in caso di errore resta la precedente
+        async with self._reload_lock:
+            filename = filename or self.table.filename
+            try:
+                table = await asyncio.to_thread(PolicyTable, self.table.variant, filename)
+            except Exception as error:
+                self.stats.errors += 1
+                return {"ok": False, "message": f"{type(error).__name__}: {error}", "filename": filename}
+            if table.grid_size != self.table.grid_size:
+                self.stats.errors += 1
+                return {"ok": False, "message": f"griglia {table.grid_size} invece di {self.table.grid_size}",
+                        "filename": filename}
+            self.batcher.flush()
+            self.table = table
+            self.stats.reloads += 1
+            print(f"♻️ Politica ricaricata da {table.filename}", flush=True)
+            return {"ok": True, "message": "ricaricata", "filename": table.filename, "reloads": self.stats.reloads}
+
+    async def _watch(self):
+        # Ricarica quando cambiano data di modifica o dimensione del file; un file scritto a meta'
+        # fallisce il caricamento e viene ritentato al cambiamento successivo
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                stat = os.stat(self.table.filename)
+            except OSError:
+                continue
+            if (stat.st_mtime_ns, stat.st_size) != self.table.signature:
+                result = await self.reload()
+                if not result["ok"]:
+                    print(f"⚠️ Ricarica fallita: {result['message']}", flush=True)
+                    self.table.signature = (stat.st_mtime_ns, stat.st_size)
+
+    def info(self):
+        return self.stats.snapshot() | {"variant": self.table.variant, "grid_size": self.table.grid_size,
+                                         "filename": self.table.filename}
+
+    async def handle(self, reader, writer):
+        self.stats.connections += 1
+        self.stats.total_connections += 1
+
+        def reply(op, request_id, payload):
+            if not writer.is_closing():
+                writer.write(HEADER.pack(op, request_id, len(payload)) + payload)
+
+        def answer(request_id, future):
+            reply(ACT, request_id, future.result().tobytes())
+
+        try:
+            while True:
+                op, request_id, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if op == ACT:
+                    payload = await reader.readexactly(length * STATE_SIZE)
+                    states = np.frombuffer(payload, dtype=np.uint8).reshape(length, STATE_SIZE)
+                    # Le risposte partono quando il lotto e' pronto, senza fermare la lettura delle richieste successive
+                    self.batcher.submit(states).add_done_callback(lambda future, request_id=request_id: answer(request_id, future))
+                elif op == STATS:
+                    await reader.readexactly(length)
+                    reply(STATS, request_id, json.dumps(self.info()).encode())
+                elif op == RELOAD:
+                    filename = (await reader.readexactly(length)).decode() or None
+                    reply(RELOAD, request_id, json.dumps(await self.reload(filename)).encode())
+                else:
+                    await reader.readexactly(length)
+                    self.stats.errors += 1
+                    reply(ERROR, request_id, f"operazione sconosciuta {op}".encode())
+                # Contropressione: se il client non legge le risposte si smette di leggere richieste
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            self.stats.connections -= 1
+            writer.close()
+
+    async def serve(self, unix=None, host="127.0.0.1", port=8765, log_every=None):
+        self._reload_lock = asyncio.Lock()
+        if unix is not None:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            self._servers.append(await asyncio.start_unix_server(self.handle, path=unix))
+            where = unix
+        else:
+            self._servers.append(await asyncio.start_server(self.handle, host, port))
+            where = f"{host}:{port}"
+        # SIGHUP ricarica la tabella, SIGTERM e SIGINT chiudono il server (e rimuovono il socket Unix)
+        loop = asyncio.get_running_loop()
+        stopping = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload()))
+            loop.add_signal_handler(signal.SIGTERM, stopping.set)
+            loop.add_signal_handler(signal.SIGINT, stopping.set)
+        except (AttributeError, NotImplementedError):
+            pass
+        tasks = [asyncio.create_task(self._watch())] if self.reload_interval else []
+        if log_every:
+            tasks.append(asyncio.create_task(self._log(log_every)))
+        print(f"🐭 Politica {self.table.variant} ({self.table.filename}) servita su {where}", flush=True)
+        try:
+            await stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            for server in self._servers:
+                server.close()
+            if unix is not None and os.path.exists(unix):
+                os.unlink(unix)
+
+    async def _log(self, every):
+        while True:
+            await asyncio.sleep(every)
+            stats = self.stats.snapshot()
+            latency = stats["latency"]
+            print(f"📊 {stats['recent_qps']:.0f} richieste/s, lotto medio {stats['mean_batch']:.1f} stati, "
+                  f"latenza p50 {latency['p50_us']:.0f} µs p99 {latency['p99_us']:.0f} µs, "
+                  f"{stats['connections']} connessioni", flush=True)
+
+class PolicyClient:
+    # Client asyncio: piu' richieste possono essere in volo insieme sulla stessa connessione
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._task = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, unix=None, host="127.0.0.1", port=8765):
+        if unix is not None:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        try:
+            while True:
+                op, request_id, length = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                payload = await self.reader.readexactly(length)
+                future = self._waiting.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if op == ERROR:
+                    future.set_exception(RuntimeError(payload.decode()))
+                elif op == ACT:
+                    future.set_result(np.frombuffer(payload, dtype=np.uint8))
+                else:
+                    future.set_result(json.loads(payload))
+        except (asyncio.IncompleteReadError, ConnectionResetError) as error:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"connessione chiusa dal server ({error!r})"))
+            self._waiting.clear()
+
+    def _request(self, op, payload, length):
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self.writer.write(HEADER.pack(op, request_id, length) + payload)
+        return future
+
+    async def act(self, states):
+        # states: uno stato (6 coordinate) o una matrice (n, 6); ritorna le azioni (n,) uint8
+        states = np.atleast_2d(np.asarray(states, dtype=np.uint8))
+        if states.shape[1] != STATE_SIZE or len(states) > MAX_STATES:
+            raise ValueError(f"Servono al massimo {MAX_STATES} stati da {STATE_SIZE} coordinate, non {states.shape}")
+        return await self._request(ACT, np.ascontiguousarray(states).tobytes(), len(states))
+
+    async def stats(self):
+        return await self._request(STATS, b"", 0)
+
+    async def reload(self, filename=None):
+        payload = os.path.abspath(filename).encode() if filename else b""
+        return await self._request(RELOAD, payload, len(payload))
+
+    async def close(self):
+        self._task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def load_generator(clients=16, in_flight=1, batch=1, seconds=5.0, verify=None, seed=None, **address):
+    # clients connessioni, ognuna con in_flight richieste da `batch` stati casuali sempre in volo,
+    # per `seconds` secondi. Con verify (una PolicyTable) controlla le risposte. Ritorna QPS e
+    # latenze misurate dal lato client
+    rng = np.random.default_rng(seed)
+    connections = [await PolicyClient.connect(**address) for _ in range(clients)]
+    grid_size = (await connections[0].stats())["grid_size"]
+    latencies = []
+    mismatches = 0
+
+    async def worker(client):
+        nonlocal mismatches
+        while time.perf_counter() < deadline:
+            states = rng.integers(grid_size, size=(batch, STATE_SIZE), dtype=np.uint8)
+            start = time.perf_counter()
+            actions = await client.act(states)
+            latencies.append(time.perf_counter() - start)
+            if verify is not None:
+                mismatches += int(np.count_nonzero(actions != verify.lookup(states)))
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(worker(client) for client in connections for _ in range(in_flight)))
+    elapsed = time.perf_counter() - start
+    server_stats = await connections[0].stats()
+    for client in connections:
+        await client.close()
+    latencies = np.array(latencies) * 1e6
+    return {
+        "requests": len(latencies),
+        "states": len(latencies) * batch,
+        "seconds": elapsed,
+        "qps": len(latencies) / elapsed,
+        "states_per_sec": len(latencies) * batch / elapsed,
+        "latency": dict(zip(("p50_us", "p90_us", "p99_us", "max_us"), np.percentile(latencies, (50, 90, 99, 100)).tolist())),
+        "mismatches": mismatches if verify is not None else None,
+        "server": server_stats,
+    }
+
+def _address(args):
+    return {"unix": args.unix} if args.unix else {"host": args.host, "port": args.port}
+
+async def _query(args):
+    client = await PolicyClient.connect(**_address(args))
+    try:
+        if args.command == "query":
+            states = np.array(args.state, dtype=np.uint8).reshape(-1, STATE_SIZE)
+            for state, action in zip(states, (await client.act(states)).tolist()):
+                print(f"{' '.join(map(str, state.tolist()))} -> {action}")
+        elif args.command == "stats":
+            print(json.dumps(await client.stats(), indent=2))
+        else:
+            print(json.dumps(await client.reload(args.filename), indent=2))
+    finally:
+        await client.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Server delle politiche greedy con lotti di richieste")
+    parser.add_argument("--variant", choices=VARIANTS, default="5x5_vuoto")
+    # L'indirizzo vale per tutti i comandi e si scrive dopo il comando
+    address = argparse.ArgumentParser(add_help=False)
+    address.add_argument("--unix", help="socket Unix (altrimenti TCP su --host/--port)")
+    address.add_argument("--host", default="127.0.0.1")
+    address.add_argument("--port", type=int, default=8765)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("serve", parents=[address], help="avvia il server")
+    command.add_argument("q_table")
+    command.add_argument("--max-batch", type=int, default=8192, help="stati oltre i quali il lotto parte subito")
+    command.add_argument("--max-delay", type=float, default=0.0, help="secondi di attesa per riempire il lotto")
+    command.add_argument("--reload-interval", type=float, default=1.0, help="secondi tra i controlli del file (0: mai)")
+    command.add_argument("--log-every", type=float, default=None, help="secondi tra le righe di statistiche")
+
+    command = commands.add_parser("query", parents=[address], help="chiede le azioni per uno o piu' stati")
+    command.add_argument("state", type=int, nargs="+", help="6 coordinate per stato")
+    commands.add_parser("stats", parents=[address], help="stampa i contatori del server")
+    command = commands.add_parser("reload", parents=[address], help="ricarica la tabella (la stessa o un altro file)")
+    command.add_argument("filename", nargs="?")
+
+    command = commands.add_parser("loadgen", parents=[address], help="genera carico e misura QPS e latenze")
+    command.add_argument("--clients", type=int, default=16)
+    command.add_argument("--in-flight", type=int, default=1, help="richieste in volo per connessione")
+    command.add_argument("--batch", type=int, default=1, help="stati per richiesta")
+    command.add_argument("--seconds", type=float, default=5.0)
+    command.add_argument("--verify", help="Q-table con cui controllare le risposte")
+    command.add_argument("--seed", type=int, default=None)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        server = PolicyServer(args.variant, args.q_table, args.max_batch, args.max_delay, args.reload_interval)
+        try:
+            asyncio.run(server.serve(args.unix, args.host, args.port, args.log_every))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "loadgen":
+        verify = PolicyTable(args.variant, args.verify) if args.verify else None
+        report = asyncio.run(load_generator(args.clients, args.in_flight, args.batch, args.seconds, verify, args.seed,
+                                            **_address(args)))
+        latency = report["latency"]
+        print(f"🚀 {report['qps']:.0f} richieste/s ({report['states_per_sec']:.0f} stati/s) in {report['seconds']:.1f}s, "
+              f"latenza p50 {latency['p50_us']:.0f} µs p99 {latency['p99_us']:.0f} µs, "
+              f"lotto medio lato server {report['server']['mean_batch']:.1f} stati")
+        if verify is not None:
+            print(f"🔍 Azioni diverse dalla tabella locale: {report['mismatches']}")
+    else:
+        if args.command == "query" and len(args.state) % STATE_SIZE:
+            build_parser().error(f"servono {STATE_SIZE} coordinate per stato")
+        asyncio.run(_query(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from variants import VARIANTS, import_variant
+
+# Ricerca degli iperparametri di Q-learning (alpha, gamma, epsilon_decay, min_epsilon) sulle
+# varianti, con i trial eseguiti in parallelo in un pool di processi e successive halving:
+# a ogni turno i trial ancora attivi vengono addestrati (train_q_learning_batch) fino al budget
+# del turno, min_episodes * eta^turno episodi in totale, poi valutati con rollout greedy
+# (evaluate_policy, gli stessi episodi per tutti i trial) e solo il miglior 1/eta di ogni
+# variante prosegue (almeno uno, addestrato turno dopo turno fino a max_episodes: il migliore,
+# "best", si sceglie solo al turno finale). Tra un turno e l'altro la Q-table di ogni trial resta su disco.
+# Tutti i risultati finiscono in un'unica tabella CSV, riscritta alla fine di ogni turno.
+#
+#   python sweep.py --variants 5x5_vuoto 5x5_bordi --search random --trials 30 --workers 16
+
+DEFAULT_SPACE = {
+    "alpha": [0.05, 0.1, 0.2, 0.5],
+    "gamma": [0.9, 0.95, 0.99],
+    "epsilon_decay": [0.99, 0.995, 0.999],
+    "min_epsilon": [0.01, 0.05, 0.1],
+}
+FIELDS = ("variant", "trial", "rung", "episodes", "alpha", "gamma", "epsilon_decay", "min_epsilon",
+          "accuracy", "accuracy_low", "accuracy_high", "caught_rate", "mean_length", "seconds", "status")
+
+def grid_search(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_search(space, trials, seed=None):
+    # Liste: scelta uniforme tra i valori; coppie (min, max): uniforme nell'intervallo
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(trials):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                config[name] = float(rng.uniform(*values))
+            else:
+                config[name] = values[rng.integers(len(values))]
+        configs.append(config)
+    return configs
+
+def _run_trial(variant, trial, rung, config, q_path, done_episodes, episodes, num_envs, eval_episodes, seed, eval_seed):
+    # Un turno di un trial: riprende la Q-table da q_path, addestra fino a `episodes` episodi
+    # totali (epsilon prosegue dalla schedule, partendo da 1.0), salva e valuta
+    main = import_variant(variant)
+    start = time.perf_counter()
+    env = main.CatMouseCheeseEnv()
+    q_table = np.load(q_path) if done_episodes else None
+    epsilon = max(config["min_epsilon"], config["epsilon_decay"] ** done_episodes)
+    q_table, _ = main.train_q_learning_batch(env, episodes=episodes - done_episodes, epsilon=epsilon, num_envs=num_envs,
+                                             seed=seed, q_table=q_table, **config)
+    np.save(q_path, q_table)
+    results = main.evaluate_policy(env, q_table, episodes=eval_episodes, seed=eval_seed)
+    return {
+        "variant": variant, "trial": trial, "rung": rung, "episodes": episodes, **config,
+        "accuracy": results["success_rate"],
+        "accuracy_low": results["success_ci"][0],
+        "accuracy_high": results["success_ci"][1],
+        "caught_rate": results["caught_rate"],
+        "mean_length": results["mean_length"],
+        "seconds": time.perf_counter() - start,
+        "status": "",
+    }
+
+def _write_results(rows, filename):
+    with open(filename, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def run_sweep(variants=VARIANTS, space=None, search="grid", trials=20, min_episodes=5000, max_episodes=200000, eta=3,
+              eval_episodes=10000, num_envs=256, workers=None, seed=None, results_file="sweep_results.csv"):
+    if search not in ("grid", "random"):
+        raise ValueError(f"search deve essere 'grid' o 'random', non {search!r}")
+    space = space or DEFAULT_SPACE
+    configs = grid_search(space) if search == "grid" else random_search(space, trials, seed)
+    eval_seed = 0 if seed is None else seed
+    active = [(variant, trial, config) for variant in variants for trial, config in enumerate(configs)]
+    rows = []
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(workers) as pool:
+        def q_path(variant, trial):
+            return os.path.join(directory, f"{variant}_{trial}.npy")
+
+        rung, done_episodes, episodes = 0, 0, min(min_episodes, max_episodes)
+        while active:
+            print(f"🔁 Turno {rung}: {len(active)} trial, {episodes} episodi ciascuno")
+            futures = [pool.submit(_run_trial, variant, trial, rung, config, q_path(variant, trial), done_episodes, episodes,
+                                   num_envs, eval_episodes, None if seed is None else np.random.SeedSequence([seed, trial, rung]),
+                                   eval_seed)
+                       for variant, trial, config in active]
+            results = [future.result() for future in as_completed(futures)]
+
+            # Successive halving separato per variante (le accuratezze non sono confrontabili tra varianti)
+            survivors = []
+            for variant in variants:
+                ranked = sorted((row for row in results if row["variant"] == variant), key=lambda row: -row["accuracy"])
+                # Almeno un trial prosegue: l'ultimo rimasto continua turno dopo turno fino a max_episodes
+                keep = max(1, len(ranked) // eta)
+                final = episodes >= max_episodes
+                for position, row in enumerate(ranked):
+                    if final:
+                        row["status"] = "best" if position == 0 else "eliminated"
+                    elif position < keep:
+                        row["status"] = "promoted"
+                        survivors.append((variant, row["trial"], configs[row["trial"]]))
+                    else:
+                        row["status"] = "eliminated"
+                    if row["status"] != "promoted":
+                        os.remove(q_path(variant, row["trial"]))
+            rows.extend(sorted(results, key=lambda row: (row["variant"], -row["accuracy"])))
+            _write_results(rows, results_file)
+
+            active = survivors
+            rung, done_episodes, episodes = rung + 1, episodes, min(episodes * eta, max_episodes)
+
+    print(f"⏱️ Sweep completato in {time.perf_counter() - start:.0f}s, risultati in {results_file}")
+    for row in rows:
+        if row["status"] == "best":
+            params = ", ".join(f"{name}={row[name]}" for name in space)
+            print(f"🏆 {row['variant']}: {params} -> accuratezza {row['accuracy'] * 100:.2f}% "
+                  f"(IC 95% {row['accuracy_low'] * 100:.2f}-{row['accuracy_high'] * 100:.2f}%) dopo {row['episodes']} episodi")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Ricerca degli iperparametri di Q-learning con successive halving")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--search", choices=("grid", "random"), default="grid")
+    parser.add_argument("--trials", type=int, default=20, help="trial per variante con --search random")
+    parser.add_argument("--min-episodes", type=int, default=5000, help="budget del primo turno")
+    parser.add_argument("--max-episodes", type=int, default=200000)
+    parser.add_argument("--eta", type=int, default=3, help="a ogni turno prosegue 1/eta dei trial")
+    parser.add_argument("--eval-episodes", type=int, default=10000)
+    parser.add_argument("--num-envs", type=int, default=256, help="episodi in parallelo in ogni trial")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+    run_sweep(args.variants, search=args.search, trials=args.trials, min_episodes=args.min_episodes,
+              max_episodes=args.max_episodes, eta=args.eta, eval_episodes=args.eval_episodes, num_envs=args.num_envs,
+              workers=args.workers, seed=args.seed, results_file=args.output)
+
+if __name__ == "__main__":
+    main()
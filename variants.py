@@ -0,0 +1,28 @@
+import importlib
+import os
+import sys
+
+# Caricamento di una variante (5x5_vuoto, 5x5_bordi, 10x10_ostacoli) dagli script della radice
+# del repository. I moduli delle varianti hanno gli stessi nomi (main, cat_mouse_cheese_env, ...):
+# quando un processo passa a un'altra variante, quelli della precedente vengono scaricati.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VARIANTS = ("5x5_vuoto", "5x5_bordi", "10x10_ostacoli")
+
+_loaded_variant = None
+
+def variant_directory(variant):
+    return os.path.join(ROOT, variant)
+
+def import_variant(variant, module="main"):
+    global _loaded_variant
+    if variant not in VARIANTS:
+        raise ValueError(f"Variante sconosciuta {variant!r}: scegliere tra {', '.join(VARIANTS)}")
+    if _loaded_variant != variant:
+        directories = {variant_directory(name) for name in VARIANTS}
+        for name, loaded in list(sys.modules.items()):
+            if os.path.dirname(getattr(loaded, "__file__", None) or "") in directories:
+                del sys.modules[name]
+        sys.path[:] = [variant_directory(variant)] + [path for path in sys.path if path not in directories]
+        _loaded_variant = variant
+    return importlib.import_module(module)